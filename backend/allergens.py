@@ -0,0 +1,144 @@
+import re
+from typing import Iterable, List, Optional
+
+from .text import tokenize
+
+# The 14 UK regulated allergens. Bit positions are stored in the database,
+# so only ever append to this tuple.
+ALLERGENS = (
+    "Celery", "Gluten", "Crustaceans", "Eggs", "Fish", "Lupin", "Milk",
+    "Molluscs", "Mustard", "Nuts", "Peanuts", "Sesame", "Soya", "Sulphites",
+)
+ALLERGEN_BITS = {name: 1 << i for i, name in enumerate(ALLERGENS)}
+# Set in may_contain_mask when an item's safety alert names no allergen we can
+# read ("Check cross-contamination"). Every exclusion rejects it; kept clear
+# of the bits ALLERGENS may grow into.
+UNKNOWN_ALLERGENS = 1 << 30
+
+# Diet flags, stored the same way
+DIETS = ("vegetarian", "vegan", "halal")
+DIET_BITS = {name: 1 << i for i, name in enumerate(DIETS)}
+
+# Allergens keyed by the stems customers and allergen sheets use for them
+ALLERGEN_SYNONYMS = {
+    "celery": "Celery",
+    "gluten": "Gluten", "wheat": "Gluten", "barley": "Gluten", "rye": "Gluten", "coeliac": "Gluten", "celiac": "Gluten",
+    "crustacean": "Crustaceans", "shellfish": "Crustaceans", "prawn": "Crustaceans", "shrimp": "Crustaceans", "crab": "Crustaceans", "lobster": "Crustaceans",
+    "egg": "Eggs",
+    "fish": "Fish",
+    "lupin": "Lupin",
+    "milk": "Milk", "dairy": "Milk", "lactose": "Milk", "cheese": "Milk", "cream": "Milk", "butter": "Milk",
+    "mollusc": "Molluscs", "mussel": "Molluscs", "oyster": "Molluscs", "squid": "Molluscs",
+    "mustard": "Mustard",
+    "nut": "Nuts", "almond": "Nuts", "hazelnut": "Nuts", "walnut": "Nuts", "cashew": "Nuts", "pecan": "Nuts", "pistachio": "Nuts",
+    "peanut": "Peanuts",
+    "sesame": "Sesame",
+    "soya": "Soya", "soy": "Soya",
+    "sulphur": "Sulphites", "sulphite": "Sulphites", "sulfite": "Sulphites", "sulfur": "Sulphites", "so2": "Sulphites",
+}
+
+DIET_SYNONYMS = {
+    "vegan": "vegan", "vg": "vegan", "plant": "vegan",
+    "vegetarian": "vegetarian", "veggie": "vegetarian", "veg": "vegetarian",
+    "halal": "halal",
+}
+
+_DIET_MARKER = re.compile(r"\b(VG|V|HALAL)\b", re.IGNORECASE)
+# Plant milks aren't Milk: "oat milk" -> "oat", "almond milk" -> "almond" (Nuts)
+_PLANT_MILK = re.compile(r"\b(oat|almond|soya?|coconut|rice|hazelnut|cashew)\s+milks?\b", re.IGNORECASE)
+# Safety alerts that state an allergen is present rather than possible
+_ALERT_CONTAINS = re.compile(r"\b(contains?|is in|are in|assume|added)\b", re.IGNORECASE)
+
+
+def parse_allergens(text: Optional[str]) -> set:
+    """Map a free-text allergen string to canonical names.
+
+    Handles the variants found on allergen sheets: "NUTS (Hazelnuts)",
+    "Peanuts/Nuts", "Sulphur Dioxide", "Milk (Cheese)", "None Listed (V, VG)".
+    """
+    if text:
+        text = _PLANT_MILK.sub(r"\1", text)
+    return {ALLERGEN_SYNONYMS[t] for t in tokenize(text) if t in ALLERGEN_SYNONYMS}
+
+
+def parse_alert(text: Optional[str]):
+    """Read a free-text safety alert into (contains, may contain, unknown).
+
+    "Brioche Bun contains Egg and Milk" and "Assume Mustard & Egg" count as
+    contains; "Flavors: Add Gluten/Soya" as may contain. An alert naming no
+    allergen is `unknown`, so exclusion filters can't vouch for the item.
+    """
+    if not text or not text.strip():
+        return set(), set(), False
+    named = set()
+    contains = set()
+    for sentence in re.split(r"[.;]\s*", text):
+        found = parse_allergens(sentence)
+        named |= found
+        if _ALERT_CONTAINS.search(sentence):
+            contains |= found
+    return contains, named - contains, not named
+
+
+def parse_diets(dietary_tags: Optional[str], name: Optional[str] = None, safety_alerts: Optional[str] = None) -> set:
+    """Diet names from the "(V)"/"(VG)" markers on an item, plus what its name
+    claims ("Vegan Breakfast") unless the tags or safety alert say "NOT VEGAN"."""
+    tags = dietary_tags or ""
+    if "NOT VEGAN" in tags.upper() or "NOT VEGAN" in (safety_alerts or "").upper():
+        return set()
+    markers = {m.upper() for m in _DIET_MARKER.findall(tags)}
+    name = (name or "").lower()
+    diets = set()
+    if "VG" in markers or "vegan" in name:
+        diets.update(("vegan", "vegetarian"))
+    if "V" in markers or "vegetarian" in name or "veggie" in name:
+        diets.add("vegetarian")
+    if "HALAL" in markers:
+        diets.add("halal")
+    return diets
+
+
+def allergen_mask(names: Iterable[str]) -> int:
+    mask = 0
+    for name in names:
+        mask |= ALLERGEN_BITS[name]
+    return mask
+
+
+def exclusion_mask(names: Iterable[str]) -> int:
+    """Bits an item must not have to be free from every allergen in `names`
+    (including UNKNOWN_ALLERGENS whenever anything is excluded)."""
+    mask = allergen_mask(names)
+    return mask | UNKNOWN_ALLERGENS if mask else 0
+
+
+def diet_mask(names: Iterable[str]) -> int:
+    mask = 0
+    for name in names:
+        mask |= DIET_BITS[name]
+    return mask
+
+
+def allergen_names(mask: int) -> List[str]:
+    return [name for name in ALLERGENS if mask & ALLERGEN_BITS[name]]
+
+
+def diet_names(mask: int) -> List[str]:
+    return [name for name in DIETS if mask & DIET_BITS[name]]
+
+
+def item_masks(
+    name: Optional[str],
+    dietary_tags: Optional[str],
+    may_contain: Optional[str],
+    safety_alerts: Optional[str] = None,
+) -> dict:
+    """Column values for a menu item's contains / may-contain / diet bitmasks."""
+    alert_contains, alert_may_contain, unknown = parse_alert(safety_alerts)
+    contains = parse_allergens(dietary_tags) | alert_contains
+    may = allergen_mask((parse_allergens(may_contain) | alert_may_contain) - contains)
+    return {
+        "allergen_mask": allergen_mask(contains),
+        "may_contain_mask": may | UNKNOWN_ALLERGENS if unknown else may,
+        "diet_mask": diet_mask(parse_diets(dietary_tags, name, safety_alerts)),
+    }
@@ -0,0 +1,210 @@
+"""Offline report on the search query log (see query_log.py).
+
+Reads the log line by line, so memory grows with the number of distinct
+queries rather than the size of the log, and reports top queries, how
+searches were answered, how many model calls a cache or precomputed answer
+would have saved, and which categories, allergens and diets customers ask
+about.
+
+    python -m backend.analytics                        # QUERY_LOG_PATH
+    python -m backend.analytics query_log.jsonl old.jsonl.gz --top 50
+    python -m backend.analytics --site beach-kiosk --json
+    python -m backend.analytics --menu                 # item counts per category
+"""
+import argparse
+import gzip
+import json
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Optional
+
+from . import menu_filters, models, sites
+from .allergens import ALLERGEN_SYNONYMS, DIET_SYNONYMS
+from .metrics import DEFAULT_BUCKETS
+from .query_log import QUERY_LOG_PATH
+from .search_cache import normalize_query
+from .text import stem, words
+
+# Paths where the query went to Gemini, so a cached answer would have saved a call
+MODEL_PATHS = {"llm", "llm_invalid", "fallback"}
+_BOUNDS_MS = tuple(b * 1000 for b in DEFAULT_BUCKETS)
+
+
+def read_entries(paths: Iterable[str]) -> Iterator[dict]:
+    """Log entries from each file in turn (.gz for rotated logs). Lines that
+    don't parse, e.g. one cut short by a crash, are skipped."""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and "q" in entry:
+                    yield entry
+
+
+class Aggregate:
+    """Running totals over log entries; add() one entry at a time."""
+
+    def __init__(self, categories: Optional[Dict[int, str]] = None):
+        self.categories = categories
+        self.total = 0
+        self.first = self.last = None
+        self.paths = Counter()
+        self.latency = {}  # path -> bucket counts, last one for slower than every bound
+        self.queries = Counter()
+        self.model_queries = Counter()  # queries that needed a model call
+        self.category_demand = Counter()
+        self.allergen_mentions = Counter()
+        self.diet_mentions = Counter()
+        self.no_results = Counter()
+
+    def add(self, entry: dict):
+        self.total += 1
+        t, path = entry.get("t"), entry.get("p", "unknown")
+        if t is not None:
+            self.first = t if self.first is None else min(self.first, t)
+            self.last = t if self.last is None else max(self.last, t)
+        self.paths[path] += 1
+        buckets = self.latency.setdefault(path, [0] * (len(_BOUNDS_MS) + 1))
+        ms = entry.get("ms") or 0
+        buckets[next((i for i, bound in enumerate(_BOUNDS_MS) if ms <= bound), len(_BOUNDS_MS))] += 1
+
+        q = normalize_query(entry["q"])
+        self.queries[q] += 1
+        if path in MODEL_PATHS:
+            self.model_queries[q] += 1
+        ids = entry.get("ids") or []
+        if not ids:
+            self.no_results[q] += 1
+        if self.categories is not None:
+            # Each search counts once per category it returned
+            for category in {self.categories.get(i, "(removed item)") or "Other" for i in ids}:
+                self.category_demand[category] += 1
+        tokens = {stem(word) for word in words(entry["q"])}
+        self.allergen_mentions.update({ALLERGEN_SYNONYMS[t] for t in tokens if t in ALLERGEN_SYNONYMS})
+        self.diet_mentions.update({DIET_SYNONYMS[t] for t in tokens if t in DIET_SYNONYMS})
+
+    def percentile(self, path: str, fraction: float) -> Optional[float]:
+        """Upper bound (ms) of the latency bucket holding the given fraction
+        of `path`'s searches; None when it's beyond the largest bucket."""
+        buckets = self.latency.get(path)
+        if not buckets:
+            return None
+        target, seen = fraction * sum(buckets), 0
+        for bound, count in zip(_BOUNDS_MS, buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def report(self, top: int = 20) -> dict:
+        distinct = len(self.queries)
+        model_calls = sum(self.model_queries.values())
+        # With a cache that never expired, every repeat of a query would be a hit
+        repeat_model_calls = model_calls - len(self.model_queries)
+        return {
+            "searches": self.total,
+            "distinct_queries": distinct,
+            "period": {"first": self.first, "last": self.last},
+            "paths": {
+                path: {
+                    "count": count,
+                    "share": round(count / self.total, 4),
+                    "p50_ms": self.percentile(path, 0.5),
+                    "p95_ms": self.percentile(path, 0.95),
+                }
+                for path, count in self.paths.most_common()
+            },
+            "cache": {
+                "hit_ratio": round(self.paths["cache"] / self.total, 4) if self.total else 0.0,
+                "hit_ratio_potential": round(1 - distinct / self.total, 4) if self.total else 0.0,
+                "model_calls": model_calls,
+                "model_calls_on_repeats": repeat_model_calls,
+            },
+            "top_queries": [{"q": q, "count": n} for q, n in self.queries.most_common(top)],
+            # Repeated model-bound queries: the ones worth precomputing
+            "precompute": [
+                {"q": q, "model_calls": n} for q, n in self.model_queries.most_common(top) if n > 1
+            ],
+            "no_results": [{"q": q, "count": n} for q, n in self.no_results.most_common(top)],
+            "category_demand": dict(self.category_demand.most_common()) if self.categories is not None else None,
+            "allergen_mentions": dict(self.allergen_mentions.most_common()),
+            "diet_mentions": dict(self.diet_mentions.most_common()),
+        }
+
+
+def _format_ms(value: Optional[float]) -> str:
+    return f"<= {value:g} ms" if value is not None else f"> {_BOUNDS_MS[-1]:g} ms"
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Searches: {report['searches']} ({report['distinct_queries']} distinct queries)", "", "By path:"]
+    for path, stats in report["paths"].items():
+        lines.append(
+            f"  {path:<12} {stats['count']:>8}  {stats['share']:>7.1%}  "
+            f"p50 {_format_ms(stats['p50_ms'])}, p95 {_format_ms(stats['p95_ms'])}"
+        )
+    cache = report["cache"]
+    lines += [
+        "",
+        f"Cache hit ratio: {cache['hit_ratio']:.1%} (repeats make {cache['hit_ratio_potential']:.1%} possible)",
+        f"Model calls: {cache['model_calls']}, {cache['model_calls_on_repeats']} of them for repeated queries",
+    ]
+    sections = (
+        ("Top queries", [(row["q"], row["count"]) for row in report["top_queries"]]),
+        ("Worth precomputing (repeated model calls)", [(row["q"], row["model_calls"]) for row in report["precompute"]]),
+        ("No results", [(row["q"], row["count"]) for row in report["no_results"]]),
+        ("Category demand (searches returning it)", list((report["category_demand"] or {}).items())),
+        ("Allergens mentioned", list(report["allergen_mentions"].items())),
+        ("Diets mentioned", list(report["diet_mentions"].items())),
+    )
+    for title, rows in sections:
+        if rows:
+            lines += ["", f"{title}:"] + [f"  {count:>8}  {name}" for name, count in rows]
+    return "\n".join(lines)
+
+
+def _load_categories(db) -> Dict[int, str]:
+    # Two columns, not ORM objects: enough to map matched IDs to categories
+    return dict(db.query(models.MenuItem.id, models.MenuItem.category))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help=f"query log files (default: {QUERY_LOG_PATH})")
+    parser.add_argument("--site", help="only searches on this site (slug)")
+    parser.add_argument("--top", type=int, default=20, help="rows in each top-N list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--menu", action="store_true", help="print item counts per category instead")
+    args = parser.parse_args(argv)
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        site = None
+        if args.site:
+            site = sites.resolve(db, args.site)
+            if site is None:
+                parser.error(f"unknown site: {args.site}")
+            sites.use_site(db, site)
+        if args.menu:
+            counts = menu_filters.category_counts(db)
+            print(json.dumps(counts, indent=2) if args.json else "\n".join(f"{row['count']:>6}  {row['category']}" for row in counts))
+            return
+        categories = _load_categories(db)
+    finally:
+        db.close()
+
+    aggregate = Aggregate(categories)
+    for entry in read_entries(args.paths or [QUERY_LOG_PATH]):
+        if site is None or entry.get("s") == site:
+            aggregate.add(entry)
+    report = aggregate.report(args.top)
+    print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Frontend asset build and serving.
+
+build() copies frontend/ into STATIC_BUILD_DIR under content-hashed names
+(app.3f9c1a2b7d4e.js), rewrites index.html to point at them, and writes
+gzip (and, with the brotli package, brotli) variants of every text file,
+plus resized WebP copies of the hero image when Pillow is installed. It runs
+at deploy time or on first startup, and is skipped while the sources are
+unchanged:
+
+    python -m backend.assets           # build into STATIC_BUILD_DIR
+    python -m backend.assets --force   # rebuild even if up to date
+
+StaticAssets serves the build, picking the best precompressed variant the
+client accepts. Hashed names never change content, so they are cached for a
+year; everything else is revalidated with its ETag.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from .log import log_event
+
+try:
+    import brotli
+except ImportError:  # optional: gzip variants only
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional: the hero image is served as-is
+    Image = None
+
+SOURCE_DIR = os.getenv("STATIC_SOURCE_DIR", "frontend")
+BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "build/static")
+# Hero image widths generated as WebP (capped at the original width)
+HERO_WIDTHS = tuple(int(w) for w in os.getenv("HERO_IMAGE_WIDTHS", "640,1280").split(","))
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+# Compression level for API responses (precompressed assets always use the maximum)
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+INDEX = "index.html"
+HERO_IMAGE = "prom.jpg"
+MANIFEST = "manifest.json"
+COMPRESSIBLE = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map"}
+# Bumped when build output changes for the same sources
+BUILD_FORMAT = "1"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+_HASHED = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+_STATIC_REF = re.compile(r"/static/([\w.-]+)")
+
+
+def _sources() -> Dict[str, bytes]:
+    sources = {}
+    for name in sorted(os.listdir(SOURCE_DIR)):
+        path = os.path.join(SOURCE_DIR, name)
+        if os.path.isfile(path) and not name.startswith("."):
+            with open(path, "rb") as f:
+                sources[name] = f.read()
+    return sources
+
+
+def _digest(sources: Dict[str, bytes]) -> str:
+    h = hashlib.sha1(f"{BUILD_FORMAT}:{bool(brotli)}:{bool(Image)}:{HERO_WIDTHS}:{WEBP_QUALITY}".encode())
+    for name, data in sources.items():
+        h.update(name.encode() + b"\0" + data)
+    return h.hexdigest()
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha1(data).hexdigest()[:12]}{ext}"
+
+
+def _write(name: str, data: bytes):
+    # Write-then-rename so a worker never serves a half-written file while
+    # another one builds
+    fd, tmp = tempfile.mkstemp(dir=BUILD_DIR, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    # mkstemp creates 0600; a front proxy may serve the build directly
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(BUILD_DIR, name))
+
+
+def _write_compressible(name: str, data: bytes):
+    _write(name, data)
+    if os.path.splitext(name)[1] not in COMPRESSIBLE:
+        return
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            _write(name + suffix, compressed)
+
+
+def _hero_variants(data: Optional[bytes]) -> Dict[str, str]:
+    """Write resized WebP copies of the hero image; {logical name: hashed name}."""
+    if data is None or Image is None:
+        return {}
+    files = {}
+    with Image.open(io.BytesIO(data)) as image:
+        stem = os.path.splitext(HERO_IMAGE)[0]
+        for width in sorted({min(w, image.width) for w in HERO_WIDTHS}):
+            resized = image.convert("RGB")
+            resized.thumbnail((width, image.height))
+            out = io.BytesIO()
+            resized.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+            name = f"{stem}-{width}.webp"
+            files[name] = hashed_name(name, out.getvalue())
+            _write(files[name], out.getvalue())
+    return files
+
+
+def _hero_css(files: Dict[str, str]) -> str:
+    """CSS preferring the WebP hero variants; browsers without image-set()
+    type() support keep the JPEG rule from index.html."""
+    widths = sorted(int(name.rsplit("-", 1)[1].split(".")[0]) for name in files if name.endswith(".webp"))
+    if not widths:
+        return ""
+    stem = os.path.splitext(HERO_IMAGE)[0]
+    jpeg = files.get(HERO_IMAGE, HERO_IMAGE)
+
+    def rule(width):
+        webp = files[f"{stem}-{width}.webp"]
+        return (f".hero-bg{{background-image:image-set(url('/static/{webp}') type('image/webp'),"
+                f"url('/static/{jpeg}') type('image/jpeg'))}}")
+
+    css = rule(widths[-1])
+    for width in reversed(widths[:-1]):
+        css += f"@media (max-width:{width}px){{{rule(width)}}}"
+    return f"<style>{css}</style>"
+
+
+def _rewrite_index(html: str, files: Dict[str, str]) -> str:
+    html = _STATIC_REF.sub(lambda m: "/static/" + files.get(m.group(1), m.group(1)), html)
+    return html.replace("</head>", _hero_css(files) + "</head>", 1)
+
+
+def load_manifest(directory: str = BUILD_DIR) -> dict:
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(force: bool = False) -> dict:
+    """Build the static assets unless they are up to date. Returns
+    {"built", "duration_ms", "files"}, files mapping logical to hashed names."""
+    started = time.perf_counter()
+    sources = _sources()
+    digest = _digest(sources)
+    manifest = load_manifest()
+    if not force and manifest.get("source") == digest:
+        return {"built": False, "duration_ms": round((time.perf_counter() - started) * 1000, 3), "files": manifest["files"]}
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    files = {}
+    for name, data in sources.items():
+        if name == INDEX:
+            continue
+        files[name] = hashed_name(name, data)
+        _write_compressible(files[name], data)
+        # Unhashed copy for pages and bookmarks from before a deploy
+        _write_compressible(name, data)
+    files.update(_hero_variants(sources.get(HERO_IMAGE)))
+    if INDEX in sources:
+        _write_compressible(INDEX, _rewrite_index(sources[INDEX].decode("utf-8"), files).encode("utf-8"))
+    _write(MANIFEST, json.dumps({"source": digest, "files": files}, indent=2).encode("utf-8"))
+
+    duration_ms = round((time.perf_counter() - started) * 1000, 3)
+    log_event("assets_built", files=len(files), brotli=brotli is not None, webp=Image is not None, duration_ms=duration_ms)
+    return {"built": True, "duration_ms": duration_ms, "files": files}
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssets(StaticFiles):
+    """StaticFiles over the build: precompressed variants and cache headers."""
+
+    def __init__(self, directory: str = BUILD_DIR):
+        # The build directory is created by build() at startup
+        super().__init__(directory=directory, check_dir=False)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        headers = {"Cache-Control": IMMUTABLE if _HASHED.search(full_path) else REVALIDATE}
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        path = full_path
+
+        if os.path.splitext(full_path)[1] in COMPRESSIBLE:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                if encoding in accepted and os.path.isfile(full_path + suffix):
+                    path = full_path + suffix
+                    stat_result = os.stat(path)
+                    headers["Content-Encoding"] = encoding
+                    break
+
+        response = FileResponse(path, status_code=status_code, stat_result=stat_result, headers=headers, media_type=media_type)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """GZip for API responses. Static assets skip it: they are served
+    precompressed, and re-compressing images only costs CPU."""
+
+    def __init__(self, app, minimum_size: int = 1000):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=GZIP_LEVEL)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (scope["path"] == "/" or scope["path"].startswith("/static/")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the sources are unchanged")
+    args = parser.parse_args(argv)
+    result = build(force=args.force)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
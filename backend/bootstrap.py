@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import exists, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import fulltext, models, seeds, sites
+from .database import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+# Bump when models (or how their masks are derived) change so the next boot
+# re-runs create_schema
+SCHEMA_VERSION = "7"
+# Arbitrary key for the Postgres advisory lock guarding migrations
+LOCK_KEY = 7241305
+
+_lock = threading.Lock()
+
+
+def _marker(conn):
+    try:
+        return conn.execute(text("SELECT value FROM app_state WHERE key = 'schema'")).scalar()
+    except SQLAlchemyError:
+        # Fresh database, app_state doesn't exist yet
+        return None
+
+
+def _write_marker(conn):
+    conn.execute(text("DELETE FROM app_state WHERE key = 'schema'"))
+    conn.execute(text("INSERT INTO app_state (key, value) VALUES ('schema', :v)"), {"v": SCHEMA_VERSION})
+
+
+def _has_menu(conn) -> bool:
+    return conn.execute(select(exists().where(models.MenuItem.site_id == sites.DEFAULT_SITE_ID))).scalar()
+
+
+def pending() -> Optional[str]:
+    """What this boot has to do: "schema" (migrate, then seed if the menu is
+    empty), "seed" (the default site's menu is empty, e.g. after clear_db)
+    or None."""
+    with engine.connect() as conn:
+        if _marker(conn) != SCHEMA_VERSION:
+            return "schema"
+        if not _has_menu(conn):
+            return "seed"
+    return None
+
+
+@contextmanager
+def migration_lock():
+    """Serialize schema work across workers: an advisory lock on Postgres, a
+    lock file next to the database on SQLite."""
+    with _lock:
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as conn:
+                conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_KEY})
+                try:
+                    yield
+                finally:
+                    conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_KEY})
+            return
+        path = engine.url.database
+        if fcntl is None or not path or path == ":memory:":
+            yield
+            return
+        with open(os.path.abspath(path) + ".lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def prepare_database() -> dict:
+    """Bring the schema up to date, and seed the default site's menu when it
+    has no items.
+
+    Migrations never touch menu data, so a menu loaded with menu_import
+    survives schema bumps. Workers that find the marker current and the menu
+    present skip straight through with two SELECTs; the first one to boot on
+    a new schema version (or on an empty menu) does the work while the rest
+    wait on the lock.
+    """
+    start = time.perf_counter()
+    migrated = seeded = False
+    if pending() is not None:
+        with migration_lock():
+            work = pending()
+            if work == "schema":
+                models.create_schema(engine)
+                sites.ensure_default_site(engine)
+                fulltext.ensure_index(engine)
+                with engine.begin() as conn:
+                    _write_marker(conn)
+                migrated = True
+            if work is not None:
+                with engine.connect() as conn:
+                    empty = not _has_menu(conn)
+                if empty:
+                    seeds.seed_data()
+                    seeded = True
+    return {
+        "migrated": migrated,
+        "seeded": seeded,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
@@ -1,9 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from . import metrics
+
 load_dotenv()
 
 # Use SQLite for local development if DATABASE_URL is not set, or a default postgres url
@@ -12,16 +14,110 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./prom_cafe.db")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Pool profile. Each worker holds up to POOL_SIZE + MAX_OVERFLOW connections,
+# so keep the total under the server's connection limit.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Hosted Postgres drops idle connections; recycle them before it does
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+
+# SQLite pragmas, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+
+
+def _engine_options() -> dict:
+    if IS_SQLITE:
+        # Sessions are used from the threadpool, never by two threads at once
+        options = {"connect_args": {"check_same_thread": False}}
+        if ":memory:" not in DATABASE_URL:
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        return options
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+        if ":memory:" not in DATABASE_URL:
+            # WAL lets readers run alongside the writer instead of failing with
+            # "database is locked"
+            cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+    return on_connect
+
+
+def _count_errors(context):
+    # e.g. "database is locked", pool timeouts surface separately as TimeoutError
+    metrics.db_errors.inc(kind=type(context.original_exception).__name__)
+
+
+def _make_engine(read_only: bool = False):
+    new_engine = create_engine(DATABASE_URL, **_engine_options())
+    if IS_SQLITE:
+        event.listen(new_engine, "connect", _sqlite_pragmas(read_only))
+    event.listen(new_engine, "handle_error", _count_errors)
+    return new_engine
+
+
+engine = _make_engine()
+# SQLite: a separate pool of query_only connections for request-path reads, so
+# they never take the write lock. Postgres (and in-memory SQLite) reads share
+# the main pool.
+read_engine = _make_engine(read_only=True) if IS_SQLITE and ":memory:" not in DATABASE_URL else engine
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
+
+def _pool_stats():
+    engines = {"write": engine, "read": read_engine} if read_engine is not engine else {"main": engine}
+    stats = []
+    for name, bound in engines.items():
+        pool = bound.pool
+        for stat in ("size", "checkedin", "checkedout", "overflow"):
+            reader = getattr(pool, stat, None)
+            if reader is not None:
+                # QueuePool.overflow() counts up from -pool_size
+                value = max(0, reader()) if stat == "overflow" else reader()
+                stats.append(({"pool": name, "stat": stat}, value))
+    return stats
+
+
+metrics.register_gauges("flavorly_db_pool", "Connection pool size and connections checked in/out.", _pool_stats)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    # Request-path reads use the read-only pool (query_only connections on SQLite)
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,115 @@
+"""Database full-text index over the menu.
+
+SQLite gets an FTS5 table kept in sync with menu_items by triggers; Postgres
+gets a generated, weighted tsvector column with a GIN index. Either way the
+index follows every insert, update and delete (seeding, imports, admin edits)
+without application code having to remember it.
+"""
+import logging
+import os
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import sites
+from .log import log_event
+from .search_index import STOPWORDS
+from .text import stem, words
+
+FULLTEXT_LIMIT = int(os.getenv("FULLTEXT_LIMIT", "20"))
+
+# bm25 weights in FTS5 column order: name, description, category, dietary_tags
+_SQLITE_WEIGHTS = "10.0, 1.0, 5.0, 2.0"
+
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS menu_items_fts USING fts5("
+    "name, description, category, dietary_tags, "
+    "content='menu_items', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS menu_items_fts_ai AFTER INSERT ON menu_items BEGIN "
+    "INSERT INTO menu_items_fts(rowid, name, description, category, dietary_tags) "
+    "VALUES (new.id, new.name, new.description, new.category, new.dietary_tags); END",
+    "CREATE TRIGGER IF NOT EXISTS menu_items_fts_ad AFTER DELETE ON menu_items BEGIN "
+    "INSERT INTO menu_items_fts(menu_items_fts, rowid, name, description, category, dietary_tags) "
+    "VALUES ('delete', old.id, old.name, old.description, old.category, old.dietary_tags); END",
+    "CREATE TRIGGER IF NOT EXISTS menu_items_fts_au AFTER UPDATE ON menu_items BEGIN "
+    "INSERT INTO menu_items_fts(menu_items_fts, rowid, name, description, category, dietary_tags) "
+    "VALUES ('delete', old.id, old.name, old.description, old.category, old.dietary_tags); "
+    "INSERT INTO menu_items_fts(rowid, name, description, category, dietary_tags) "
+    "VALUES (new.id, new.name, new.description, new.category, new.dietary_tags); END",
+)
+
+# 'simple' config: no stemming, so prefix queries behave as on SQLite
+_POSTGRES_DDL = (
+    "ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(dietary_tags, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'D')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_menu_items_search_vector ON menu_items USING GIN (search_vector)",
+)
+
+
+def ensure_index(engine) -> bool:
+    """Create the full-text index if it's missing; False if the database
+    can't provide one (e.g. SQLite built without FTS5)."""
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                for ddl in _POSTGRES_DDL:
+                    conn.execute(text(ddl))
+                return True
+            if engine.dialect.name != "sqlite":
+                return False
+            existed = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'menu_items_fts'")
+            ).scalar()
+            for ddl in _SQLITE_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                # Index rows written before the table existed
+                conn.execute(text("INSERT INTO menu_items_fts(menu_items_fts) VALUES ('rebuild')"))
+        return True
+    except SQLAlchemyError as e:
+        log_event("fulltext_unavailable", logging.WARNING, error=str(e))
+        return False
+
+
+def query_terms(q: str) -> List[str]:
+    """Prefixes to match: "Sausages" -> "sausage", "pastries" -> "pastr"."""
+    terms = []
+    for word in words(q):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        stemmed = stem(word)
+        # Longest prefix shared by the word and its stem covers both forms
+        prefix = os.path.commonprefix([word, stemmed])
+        if prefix and prefix not in terms:
+            terms.append(prefix)
+    return terms
+
+
+def search(db: Session, q: str, limit: int = FULLTEXT_LIMIT) -> List[int]:
+    """IDs of the site's items ranked by relevance; items matching more terms,
+    and in weightier fields (name > category > tags > description), come first."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        sql = text(
+            "SELECT id FROM menu_items, to_tsquery('simple', :query) query "
+            "WHERE search_vector @@ query AND site_id = :site "
+            "ORDER BY ts_rank(search_vector, query) DESC, id LIMIT :limit"
+        )
+        query = " | ".join(f"{t}:*" for t in terms)
+    else:
+        sql = text(
+            "SELECT menu_items_fts.rowid FROM menu_items_fts "
+            "JOIN menu_items ON menu_items.id = menu_items_fts.rowid "
+            "WHERE menu_items_fts MATCH :query AND menu_items.site_id = :site "
+            f"ORDER BY bm25(menu_items_fts, {_SQLITE_WEIGHTS}), menu_items_fts.rowid LIMIT :limit"
+        )
+        query = " OR ".join(f'"{t}"*' for t in terms)
+    params = {"query": query, "site": sites.site_id(db), "limit": limit}
+    return [row[0] for row in db.execute(sql, params)]
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from .log import log_event
+
+load_dotenv()
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.0-flash")
+# Seconds a single model call may take before we answer locally instead
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "8"))
+# Model calls allowed in flight at once, per worker
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Seconds a request waits for a free slot before falling back
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "0.25"))
+
+# Created on first use: importing and configuring the Gemini SDK takes a
+# good part of a second, which every worker would otherwise pay on boot
+model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                import google.generativeai as genai
+
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    log_event("gemini_api_key_missing", logging.WARNING)
+                genai.configure(api_key=api_key)
+                model = genai.GenerativeModel(GEMINI_MODEL)
+    return model
+
+
+class LLMUnavailable(Exception):
+    """The model could not be asked in time (deadline hit or too many calls in flight)."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason  # "busy" or "timeout"
+
+
+_semaphore = None
+_semaphore_loop = None
+_inflight = {}
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Semaphores belong to one event loop; recreate if the loop changed
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+async def _acquire() -> asyncio.Semaphore:
+    semaphore = _get_semaphore()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LLMUnavailable("busy", f"{LLM_MAX_CONCURRENCY} model calls already in flight")
+    return semaphore
+
+
+async def _call(prompt: str) -> str:
+    semaphore = await _acquire()
+    try:
+        response = await asyncio.wait_for(get_model().generate_content_async(prompt), LLM_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LLMUnavailable("timeout", f"model call exceeded {LLM_TIMEOUT}s")
+    finally:
+        semaphore.release()
+    return response.text.strip()
+
+
+async def generate(prompt: str, key: str = None) -> str:
+    """Ask the model for `prompt`, sharing one upstream call between
+    concurrent requests with the same `key`."""
+    key = key or prompt
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_call(prompt))
+        _inflight[key] = task
+
+        def _forget(done, key=key):
+            if _inflight.get(key) is done:
+                del _inflight[key]
+
+        task.add_done_callback(_forget)
+    # Shield so one client disconnecting doesn't cancel the call for the others
+    return await asyncio.shield(task)
+
+
+async def stream(prompt: str):
+    """Yield the model reply in text chunks as Gemini produces them.
+
+    Streams are not coalesced, but share the concurrency cap, and each chunk
+    must arrive within LLM_TIMEOUT.
+    """
+    semaphore = await _acquire()
+    try:
+        try:
+            response = await asyncio.wait_for(get_model().generate_content_async(prompt, stream=True), LLM_TIMEOUT)
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), LLM_TIMEOUT)
+                except StopAsyncIteration:
+                    break
+                yield chunk.text
+        except asyncio.TimeoutError:
+            raise LLMUnavailable("timeout", f"model stream stalled for {LLM_TIMEOUT}s")
+    finally:
+        semaphore.release()
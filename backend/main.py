@@ -1,26 +1,73 @@
-from fastapi import FastAPI, Depends, HTTPException
+import time
+
+# Measured from the first import so the startup report covers import cost too
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-import google.generativeai as genai
-import os
-import json
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
-from . import models, schemas, database, seeds
+from . import models, schemas, seeds, bootstrap, assets, llm, metrics, search, menu_snapshot, menu_filters, sites
+from .database import get_db, get_read_db
+from .query_log import query_log
+from .log import log_event
+from .search_cache import search_cache
 
 # Load environment variables
 load_dotenv()
 
-# Create tables
-models.Base.metadata.create_all(bind=database.engine)
+_imported = time.perf_counter()
+startup_timings = {}
+metrics.register_gauges(
+    "flavorly_startup_seconds",
+    "Time this worker spent importing, preparing the database and assets, and booting in total.",
+    lambda: [({"phase": k}, v) for k, v in startup_timings.items()],
+)
+
+def _report_model_warmup(future):
+    # Retrieving the exception here also keeps asyncio from warning about it;
+    # the first search retries get_model() anyway
+    error = None if future.cancelled() else future.exception()
+    if error is not None:
+        log_event("gemini_warmup_failed", logging.ERROR, error=f"{type(error).__name__}: {error}")
 
-app = FastAPI(title="Flavorly API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema and seed run once per schema version, not on every worker boot
+    db_state = await run_in_threadpool(bootstrap.prepare_database)
+    # Hashed, precompressed frontend files; a no-op when built at deploy time
+    assets_state = await run_in_threadpool(assets.build)
+    # Build the Gemini client off the event loop so the first search doesn't wait for it
+    app.state.model_warmup = asyncio.get_running_loop().run_in_executor(None, llm.get_model)
+    app.state.model_warmup.add_done_callback(_report_model_warmup)
+    ready = time.perf_counter()
+    startup_timings.update(
+        imports=round(_imported - _import_started, 6),
+        database=round(db_state["duration_ms"] / 1000, 6),
+        assets=round(assets_state["duration_ms"] / 1000, 6),
+        total=round(ready - _import_started, 6),
+    )
+    log_event(
+        "startup",
+        import_ms=round((_imported - _import_started) * 1000, 3),
+        database_ms=db_state["duration_ms"],
+        migrated=db_state["migrated"],
+        seeded=db_state["seeded"],
+        assets_ms=assets_state["duration_ms"],
+        assets_built=assets_state["built"],
+        total_ms=round((ready - _import_started) * 1000, 3),
+    )
+    yield
+    # Write out queued search log entries before the worker exits
+    await run_in_threadpool(query_log.close)
 
-@app.on_event("startup")
-def on_startup():
-    seeds.seed_data()
+app = FastAPI(title="Flavorly API", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -31,134 +78,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# JSON responses; SSE streams and static assets are left alone
+app.add_middleware(assets.APIGZipMiddleware)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template so /menu/search/?q=... doesn't explode cardinality
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.http_requests.inc(method=request.method, route=path, status=response.status_code)
+    metrics.http_latency.observe(time.perf_counter() - start, method=request.method, route=path)
+    return response
+
+def get_site_db(slug: str, db: Session = Depends(get_read_db)):
+    # The read session, scoped to the site in the URL
+    site = sites.resolve(db, slug)
+    if site is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site: {slug}")
+    return sites.use_site(db, site)
 
 @app.get("/seed_db")
 def seed_database(force: bool = False, db: Session = Depends(get_db)):
     try:
-        seeds.seed_data(force=force)
-        return {"message": "Database seeded successfully", "force": force}
+        report = seeds.seed_data(force=force)
+        return {"message": "Database seeded successfully", "force": force, "changes": report.as_dict()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
-def health_check(db: Session = Depends(get_db)):
+def health_check(db: Session = Depends(get_read_db)):
     count = db.query(models.MenuItem).count()
     return {"status": "healthy", "item_count": count}
 
 @app.get("/menu/", response_model=List[schemas.MenuItem])
-def read_menu_items(skip: int = 0, limit: int = 1000, db: Session = Depends(get_db)):
-    items = db.query(models.MenuItem).offset(skip).limit(limit).all()
-    return items
+def read_menu_items(request: Request, skip: int = 0, limit: int = 1000, category: Optional[str] = None, db: Session = Depends(get_read_db)):
+    # Served from the pre-encoded snapshot; 304 when the client's ETag is current
+    snapshot = menu_snapshot.get_snapshot(db)
+    return snapshot.response(request, skip, limit, category)
+
+@app.get("/menu/categories")
+def read_categories(db: Session = Depends(get_read_db)):
+    return menu_filters.category_counts(db)
+
+@app.get("/menu/filter", response_model=List[schemas.MenuItem])
+def filter_menu_items(
+    category: Optional[str] = None,
+    diet: List[str] = Query(default=[]),
+    exclude: List[str] = Query(default=[]),
+    db: Session = Depends(get_read_db),
+):
+    # e.g. /menu/filter?category=Mains&diet=vegan&exclude=nuts&exclude=gluten
+    diets = menu_filters.parse_diet_values(diet)
+    allergens = menu_filters.parse_allergen_values(exclude)
+    return menu_filters.filter_items(db, category, diets, allergens)
 
-# Configure Gemini
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    print("WARNING: GEMINI_API_KEY not found in environment variables")
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel('models/gemini-2.0-flash')
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/menu/search/cache")
+def search_cache_stats():
+    return search_cache.info()
 
 @app.get("/menu/search/", response_model=schemas.SearchResponse)
-def search_menu_items(q: str, db: Session = Depends(get_db)):
-    # Fetch all items to provide context to Gemini
-    all_items = db.query(models.MenuItem).all()
-    
-    # Create a simplified representation
-    menu_context = []
-    for item in all_items:
-        menu_context.append({
-            "id": item.id,
-            "name": item.name,
-            "desc": item.description,
-            "price": item.price,
-            "tags": item.dietary_tags,
-            "allergens": item.may_contain
-        })
-    
-    prompt = f"""
-    You are a helpful waiter at Prom Cafe. 
-    Here is the menu: {json.dumps(menu_context)}
-    
-    The customer asks: "{q}"
-    
-    Task: 
-    1. Identify the menu items that best match the request.
-    2. If the user asks for a meal plan or suggestion, select specific items.
-    3. If the user specifies a quantity (e.g. "3 people" or "3 breakfasts"), assume they want that quantity for ALL requested items (like drinks) unless they say otherwise.
-    4. Handle mixed dietary requests (e.g. "3 meals, one vegan"). Select items that satisfy EACH person's requirement.
-    5. Provide a structured answer listing the selected items. Consolidate duplicates.
-       Format:
-       [Quantity] x [Item Name] @ £[Unit Price] = £[Line Total]
-       
-       Total: £[Total Price]
-       
-       (You can add a brief friendly sentence before or after if appropriate).
-    
-    Return a JSON object with two keys:
-    - "ids": Array of integers (IDs of matched items).
-    - "answer": String (Your structured response).
-    
-    Example: {{ "ids": [1], "answer": "Three Full English Breakfasts would cost £38.85." }}
-    """
-    
-    try:
-        response = model.generate_content(prompt)
-        text_response = response.text.strip()
-        print(f"Gemini Response: {text_response}")
-        
-        # Robust JSON extraction
-        try:
-            # Find the first { and last }
-            start_idx = text_response.find('{')
-            end_idx = text_response.rfind('}')
-            
-            if start_idx != -1 and end_idx != -1:
-                json_str = text_response[start_idx:end_idx+1]
-                data = json.loads(json_str)
-            else:
-                # Try parsing as list if it returned just a list
-                start_idx_list = text_response.find('[')
-                end_idx_list = text_response.rfind(']')
-                if start_idx_list != -1 and end_idx_list != -1:
-                     json_str = text_response[start_idx_list:end_idx_list+1]
-                     ids = json.loads(json_str)
-                     data = {"ids": ids, "answer": "Here are some suggestions."}
-                else:
-                    raise ValueError("No JSON found")
-
-            matched_ids = data.get("ids", [])
-            answer = data.get("answer", "")
-            
-            # Ensure IDs are integers
-            matched_ids = [int(id) for id in matched_ids if isinstance(id, (int, str)) and str(id).isdigit()]
-            
-            results = []
-            if matched_ids:
-                results = db.query(models.MenuItem).filter(models.MenuItem.id.in_(matched_ids)).all()
-                
-            return schemas.SearchResponse(items=results, answer=answer)
-
-        except json.JSONDecodeError:
-            print("Failed to parse JSON from AI response")
-            return schemas.SearchResponse(items=[], answer="I found some items but couldn't process them perfectly. Please try again.")
-            
-    except Exception as e:
-        print(f"AI Search Error: {e}")
-        # Fallback
-        items = db.query(models.MenuItem).filter(
-            models.MenuItem.name.ilike(f"%{q}%") | 
-            models.MenuItem.description.ilike(f"%{q}%")
-        ).all()
-        return schemas.SearchResponse(items=items, answer=f"AI Error: {str(e)}")
+async def search_menu_items(q: str, mode: Literal["auto", "fulltext"] = "auto", db: Session = Depends(get_read_db)):
+    # auto: cache, local index, then Gemini; fulltext: ranked database full-text match only.
+    # Either way the pipeline returns the serialized response, ready to send
+    if mode == "fulltext":
+        body = await search.run_fulltext(db, q)
+    else:
+        body = await search.run_search(db, q)
+    return Response(content=body, media_type="application/json")
+
+@app.post("/menu/search/batch", response_model=schemas.BatchSearchResponse)
+async def batch_search_menu_items(request: schemas.BatchSearchRequest, db: Session = Depends(get_read_db)):
+    # One result per query, in order; e.g. one query per diner at a kiosk
+    if len(request.queries) > search.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {search.BATCH_MAX_QUERIES} queries per batch")
+    body = await search.run_batch(db, request.queries)
+    return Response(content=body, media_type="application/json")
+
+@app.get("/menu/search/stream")
+async def stream_menu_search(q: str):
+    return StreamingResponse(
+        search.stream_events(q),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Site-scoped routes: the same handlers, on the menu of the site in the URL
+# (the unscoped routes above serve the default site)
+@app.get("/sites/", response_model=List[schemas.Site])
+def read_sites(db: Session = Depends(get_read_db)):
+    return db.query(models.Site).order_by(models.Site.id).all()
+
+@app.get("/sites/{slug}/menu/", response_model=List[schemas.MenuItem])
+def read_site_menu_items(request: Request, skip: int = 0, limit: int = 1000, category: Optional[str] = None, db: Session = Depends(get_site_db)):
+    return read_menu_items(request, skip, limit, category, db)
+
+@app.get("/sites/{slug}/menu/categories")
+def read_site_categories(db: Session = Depends(get_site_db)):
+    return read_categories(db)
+
+@app.get("/sites/{slug}/menu/filter", response_model=List[schemas.MenuItem])
+def filter_site_menu_items(
+    category: Optional[str] = None,
+    diet: List[str] = Query(default=[]),
+    exclude: List[str] = Query(default=[]),
+    db: Session = Depends(get_site_db),
+):
+    return filter_menu_items(category, diet, exclude, db)
+
+@app.get("/sites/{slug}/menu/search/", response_model=schemas.SearchResponse)
+async def search_site_menu_items(q: str, mode: Literal["auto", "fulltext"] = "auto", db: Session = Depends(get_site_db)):
+    return await search_menu_items(q, mode, db)
+
+@app.post("/sites/{slug}/menu/search/batch", response_model=schemas.BatchSearchResponse)
+async def batch_search_site_menu_items(request: schemas.BatchSearchRequest, db: Session = Depends(get_site_db)):
+    return await batch_search_menu_items(request, db)
+
+@app.get("/sites/{slug}/menu/search/stream")
+async def stream_site_menu_search(q: str, db: Session = Depends(get_site_db)):
+    return StreamingResponse(
+        search.stream_events(q, sites.site_id(db)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-# Serve static files
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
+# Serve the built frontend (see assets.py)
+static_assets = assets.StaticAssets()
+app.mount("/static", static_assets, name="static")
 
 @app.get("/")
-async def read_index():
-    return FileResponse('frontend/index.html')
+async def read_index(request: Request):
+    return await static_assets.get_response(assets.INDEX, request.scope)
@@ -0,0 +1,127 @@
+import json
+import os
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models, sites
+from .allergens import ALLERGENS, ALLERGEN_BITS, DIET_BITS, UNKNOWN_ALLERGENS, exclusion_mask
+from .search_index import MenuIndex
+
+# Send only the categories a query hints at ("vegan breakfast" -> Breakfast)
+CATEGORY_FILTER = os.getenv("PROMPT_CATEGORY_FILTER", "1") == "1"
+
+LEGEND = (
+    "Menu JSON: {\"A\": allergen names, \"M\": {category: [items]}}. "
+    "Item keys: i=id, n=name, d=description, p=price (GBP), "
+    "v=diet (VG vegan, V vegetarian), a=contains, m=may contain "
+    "(a and m are indexes into A), u=1 allergens unconfirmed (never offer "
+    "it to someone avoiding an allergen)."
+)
+
+
+def _compact(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+class MenuContext:
+    """Pre-serialized, compact menu used as the Gemini prompt context.
+
+    Each category is encoded once; render() only joins the fragments needed
+    for a query, so the request path does no ORM or JSON work. Allergen codes
+    are bit positions from allergens.ALLERGENS, listed once in "A".
+    """
+
+    def __init__(self, items):
+        self.allergens = list(ALLERGENS)
+        grouped = {}
+
+        for item in items:
+            entry = {"i": item.id, "n": item.name, "p": item.price}
+            if item.description:
+                entry["d"] = _compact(item.description)
+            if item.diet_mask & DIET_BITS["vegan"]:
+                entry["v"] = "VG"
+            elif item.diet_mask & DIET_BITS["vegetarian"]:
+                entry["v"] = "V"
+            for key, mask in (("a", item.allergen_mask), ("m", item.may_contain_mask)):
+                codes = [i for i, name in enumerate(ALLERGENS) if mask & ALLERGEN_BITS[name]]
+                if codes:
+                    entry[key] = codes
+            if item.may_contain_mask & UNKNOWN_ALLERGENS:
+                entry["u"] = 1
+            fragment = json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+            grouped.setdefault(item.category or "Other", []).append((item.id, item.allergen_mask | item.may_contain_mask, fragment))
+
+        self.categories = list(grouped)
+        self._items = grouped
+        self._fragments = {category: self._encode(category) for category in grouped}
+        self._allergens_json = json.dumps(self.allergens, separators=(",", ":"))
+        self._full = self._join(self.categories)
+
+    def _encode(self, category: str, excluded: int = 0) -> str:
+        entries = ",".join(fragment for _, mask, fragment in self._items[category] if not mask & excluded)
+        return json.dumps(category, ensure_ascii=False) + ":[" + entries + "]"
+
+    def _join(self, categories: Iterable[str], excluded: int = 0) -> str:
+        if excluded:
+            body = ",".join(self._encode(c, excluded) for c in categories if c in self._items)
+        else:
+            body = ",".join(self._fragments[c] for c in categories if c in self._fragments)
+        return '{"A":' + self._allergens_json + ',"M":{' + body + "}}"
+
+    def render(self, categories: Optional[Iterable[str]] = None, excluded: int = 0) -> str:
+        """The menu JSON, limited to `categories` and without items that
+        contain or may contain an allergen in the `excluded` bitmask."""
+        if not categories and not excluded:
+            return self._full
+        wanted = set(categories or self.categories)
+        return self._join((c for c in self.categories if c in wanted), excluded)
+
+    def render_items(self, ids: Iterable[int], excluded: int = 0) -> str:
+        """The menu JSON with only the items in `ids` (e.g. vector retrieval
+        candidates), still grouped by category in menu order."""
+        wanted = set(ids)
+        body = []
+        for category in self.categories:
+            entries = [
+                fragment for item_id, mask, fragment in self._items[category]
+                if item_id in wanted and not mask & excluded
+            ]
+            if entries:
+                body.append(json.dumps(category, ensure_ascii=False) + ":[" + ",".join(entries) + "]")
+        return '{"A":' + self._allergens_json + ',"M":{' + ",".join(body) + "}}"
+
+    def excluded_for(self, q: str, index: MenuIndex) -> int:
+        """Allergens the customer ruled out ("no nuts"), as a bitmask.
+
+        Diets are not applied here: in a group order they often concern
+        only one person.
+        """
+        return exclusion_mask(index.parse(q).exclude)
+
+    def categories_for(self, q: str, index: MenuIndex) -> Optional[set]:
+        """Categories worth sending for `q`, or None to send the whole menu."""
+        if not CATEGORY_FILTER:
+            return None
+        parsed = index.parse(q)
+        if not parsed.categories:
+            return None
+        # Keep categories of keyword hits too, e.g. the coffee in "vegan breakfast and a coffee"
+        wanted = set(parsed.categories)
+        for token in parsed.keywords:
+            wanted.update(index.categories[item_id] or "Other" for item_id in index.postings[token])
+        return wanted
+
+
+_contexts = sites.SiteCache("menu_context")
+
+
+def _build(db: Session, version: str) -> MenuContext:
+    return MenuContext(
+        db.query(models.MenuItem).filter(models.MenuItem.site_id == sites.site_id(db)).order_by(models.MenuItem.id).all()
+    )
+
+
+def get_context(db: Session) -> MenuContext:
+    return _contexts.get_or_build(db, _build)
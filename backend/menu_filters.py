@@ -0,0 +1,66 @@
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, sites
+from .allergens import ALLERGEN_SYNONYMS, DIET_SYNONYMS, diet_mask, exclusion_mask
+from .text import stem
+
+
+def _canonical(values: Optional[List[str]], synonyms: dict, kind: str) -> set:
+    names = set()
+    for value in values or []:
+        for part in value.split(","):
+            token = stem(part.strip().lower())
+            if not token:
+                continue
+            if token not in synonyms:
+                raise HTTPException(status_code=400, detail=f"Unknown {kind}: {part.strip()}")
+            names.add(synonyms[token])
+    return names
+
+
+def parse_diet_values(values: Optional[List[str]]) -> set:
+    """"vegan", "VG", "vegetarian" ... -> canonical diet names."""
+    return _canonical(values, DIET_SYNONYMS, "diet")
+
+
+def parse_allergen_values(values: Optional[List[str]]) -> set:
+    """"nuts", "dairy", "gluten" ... -> canonical allergen names."""
+    return _canonical(values, ALLERGEN_SYNONYMS, "allergen")
+
+
+def filter_items(db: Session, category: Optional[str] = None, diets: set = (), exclude: set = ()):
+    """The site's menu items in `category` that meet every diet in `diets` and
+    neither contain nor may contain any allergen in `exclude`."""
+    query = db.query(models.MenuItem).options(selectinload(models.MenuItem.ingredients))
+    query = query.filter(models.MenuItem.site_id == sites.site_id(db), *mask_filters(diets, exclude))
+    if category:
+        query = query.filter(models.MenuItem.category == category)
+    return query.order_by(models.MenuItem.id).all()
+
+
+def mask_filters(diets: set = (), exclude: set = ()) -> list:
+    """SQL predicates for required diets and excluded allergens."""
+    clauses = []
+    required = diet_mask(diets)
+    if required:
+        clauses.append(models.MenuItem.diet_mask.op("&")(required) == required)
+    excluded = exclusion_mask(exclude)
+    if excluded:
+        clauses.append(models.MenuItem.allergen_mask.op("&")(excluded) == 0)
+        clauses.append(models.MenuItem.may_contain_mask.op("&")(excluded) == 0)
+    return clauses
+
+
+def category_counts(db: Session):
+    rows = (
+        db.query(models.MenuItem.category, func.count(models.MenuItem.id))
+        .filter(models.MenuItem.site_id == sites.site_id(db))
+        .group_by(models.MenuItem.category)
+        .order_by(func.min(models.MenuItem.id))
+        .all()
+    )
+    return [{"category": category, "count": count} for category, count in rows]
@@ -0,0 +1,167 @@
+"""Incremental menu import.
+
+Diffs incoming items against the menu by name, then applies only the
+differences in bulk inside one transaction. Existing rows keep their IDs, so
+re-running an import with the same data is a no-op and leaves caches alone.
+
+    python -m backend.menu_import                 # built-in menu (parse_structured)
+    python -m backend.menu_import menu.json --prune
+    python -m backend.menu_import menu.csv --dry-run
+    python -m backend.menu_import allergen_sheet.txt  # raw allergen-sheet dump
+    python -m backend.menu_import kiosk.txt --site beach-kiosk --site-name "Beach Kiosk"
+
+Imports apply to the session's site (see sites.py); the CLI creates the
+site named by --site if it doesn't exist yet.
+"""
+import argparse
+import csv
+import json
+from typing import List, NamedTuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas, menu_version, sites
+from .allergens import item_masks
+
+# Columns compared and written; `name` is the stable key
+FIELDS = tuple(name for name in schemas.MenuItemCreate.model_fields if name != "name")
+
+
+class ImportReport(NamedTuple):
+    added: List[dict]
+    updated: List[dict]
+    removed: List[dict]
+    unchanged: int
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def as_dict(self) -> dict:
+        return {
+            "added": self.added,
+            "updated": self.updated,
+            "removed": self.removed,
+            "unchanged": self.unchanged,
+        }
+
+
+def load_items(path: str = None) -> List[schemas.MenuItemCreate]:
+    """Items from a JSON list, CSV file or raw .txt allergen-sheet dump, or
+    the built-in menu when `path` is None."""
+    if path is None:
+        from .parse_menu import parse_structured
+        raw = parse_structured()
+    elif path.lower().endswith(".txt"):
+        from .parse_menu import parse_menu_dump
+        return list(parse_menu_dump(path))
+    elif path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            # Empty CSV cells mean "not set"
+            raw = [{k: (v if v != "" else None) for k, v in row.items()} for row in csv.DictReader(f)]
+    else:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    return [schemas.MenuItemCreate.model_validate(row) for row in raw]
+
+
+def _row(item: schemas.MenuItemCreate, site: int) -> dict:
+    row = {field: getattr(item, field) for field in FIELDS}
+    row["name"] = item.name
+    row["site_id"] = site
+    # Bulk statements skip the ORM before_insert/update hooks, so derive masks here
+    row.update(item_masks(item.name, item.dietary_tags, item.may_contain, item.safety_alerts))
+    return row
+
+
+def diff_menu(db: Session, items: List[schemas.MenuItemCreate], prune: bool = False):
+    """Return (inserts, updates, deletes, report) for bringing the site's menu in line with `items`."""
+    site = sites.site_id(db)
+    columns = [models.MenuItem.id, models.MenuItem.name] + [getattr(models.MenuItem, f) for f in FIELDS]
+    current = {row.name: row for row in db.query(*columns).filter(models.MenuItem.site_id == site)}
+
+    inserts, updates, report = [], [], ImportReport([], [], [], 0)
+    seen = set()
+    unchanged = 0
+    for item in items:
+        if item.name in seen:
+            raise ValueError(f"Duplicate menu item name: {item.name}")
+        seen.add(item.name)
+        row = _row(item, site)
+        existing = current.get(item.name)
+        if existing is None:
+            inserts.append(row)
+            report.added.append({"name": item.name})
+            continue
+        changed = [f for f in FIELDS if getattr(existing, f) != row[f]]
+        if not changed:
+            unchanged += 1
+            continue
+        row["id"] = existing.id
+        updates.append(row)
+        report.updated.append({"id": existing.id, "name": item.name, "fields": changed})
+
+    deletes = []
+    if prune:
+        for name, existing in current.items():
+            if name not in seen:
+                deletes.append(existing.id)
+                report.removed.append({"id": existing.id, "name": name})
+    return inserts, updates, deletes, report._replace(unchanged=unchanged)
+
+
+def import_menu(db: Session, items: List[schemas.MenuItemCreate], prune: bool = False, dry_run: bool = False) -> ImportReport:
+    """Apply `items` to the site's menu and record the new MenuVersion. With
+    `prune`, items missing from `items` are deleted (with their ingredient links)."""
+    inserts, updates, deletes, report = diff_menu(db, items, prune)
+    if dry_run or not report.changed:
+        return report
+    try:
+        if deletes:
+            db.execute(delete(models.item_ingredients).where(models.item_ingredients.c.menu_item_id.in_(deletes)))
+            db.execute(delete(models.MenuItem).where(models.MenuItem.id.in_(deletes)))
+        if updates:
+            # executemany keyed on the primary key
+            db.execute(update(models.MenuItem), updates)
+        if inserts:
+            db.execute(insert(models.MenuItem), inserts)
+        db.add(models.MenuVersion(
+            site_id=sites.site_id(db),
+            version=menu_version.compute_version(db),
+            added=len(report.added),
+            updated=len(report.updated),
+            removed=len(report.removed),
+        ))
+        menu_version.mark_changed(db, sites.site_id(db))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="JSON, CSV or .txt dump file (default: built-in menu)")
+    parser.add_argument("--prune", action="store_true", help="delete items missing from the import")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without applying them")
+    parser.add_argument("--site", default=sites.DEFAULT_SITE_SLUG, help="slug of the site to import into")
+    parser.add_argument("--site-name", help="display name when --site is created")
+    args = parser.parse_args(argv)
+
+    from .database import SessionLocal, engine
+
+    models.create_schema(engine)
+    sites.ensure_default_site(engine)
+    db = SessionLocal()
+    try:
+        sites.use_site(db, sites.ensure_site(db, args.site, args.site_name))
+        report = import_menu(db, load_items(args.path), prune=args.prune, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
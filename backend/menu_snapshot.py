@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, schemas, sites
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Browsers may reuse the menu for this long before revalidating with the ETag
+MENU_CACHE_MAX_AGE = int(os.getenv("MENU_CACHE_MAX_AGE", "60"))
+
+
+class Body:
+    """One pre-encoded JSON body with its compressed variants."""
+
+    def __init__(self, raw: bytes, tag: str, encodings=("br", "gzip")):
+        self.raw = raw
+        self.tag = tag
+        self.etag = f'"{tag}"'
+        self.encoded = {}
+        if "gzip" in encodings:
+            self.encoded["gzip"] = gzip.compress(raw, compresslevel=9, mtime=0)
+        if "br" in encodings and brotli is not None:
+            self.encoded["br"] = brotli.compress(raw)
+
+    def pick(self, accept_encoding: str):
+        """Return (encoding, bytes, etag) for the client's Accept-Encoding."""
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encoded:
+                return encoding, self.encoded[encoding], f'"{self.tag}-{encoding}"'
+        return None, self.raw, self.etag
+
+
+class MenuSnapshot:
+    """The fully serialized menu for one menu version.
+
+    Built once per version: the whole menu and each category are encoded
+    (and compressed) up front, and skip/limit requests slice the per-item
+    fragments instead of querying the database.
+    """
+
+    def __init__(self, items, version: str):
+        self.version = version
+        self.built_at = time.time()
+        self.fragments = []
+        self.categories = []
+        for item in items:
+            self.fragments.append(schemas.MenuItem.model_validate(item).model_dump_json().encode("utf-8"))
+            self.categories.append(item.category)
+
+        self.full = Body(self._encode(range(len(self.fragments))), version)
+        self.by_category = {}
+        for category in dict.fromkeys(self.categories):
+            positions = [i for i, c in enumerate(self.categories) if c == category]
+            tag = f"{version}-{hashlib.sha1(str(category).encode()).hexdigest()[:8]}"
+            self.by_category[category] = (positions, Body(self._encode(positions), tag))
+
+    def _encode(self, positions) -> bytes:
+        return b"[" + b",".join(self.fragments[i] for i in positions) + b"]"
+
+    def select(self, skip: int, limit: int, category: Optional[str]) -> Body:
+        if category is not None:
+            positions, body = self.by_category.get(category, ([], None))
+            if body is None:
+                return Body(b"[]", f"{self.version}-empty", encodings=())
+        else:
+            positions, body = range(len(self.fragments)), self.full
+        if skip <= 0 and limit >= len(positions):
+            return body
+        window = list(positions)[max(skip, 0):max(skip, 0) + max(limit, 0)]
+        # Slices are encoded per request, so gzip only (brotli is too slow
+        # here). Compressing them here rather than in the gzip middleware
+        # gives each encoding its own ETag, like the full menu's.
+        return Body(self._encode(window), f"{body.tag}-{skip}-{limit}", encodings=("gzip",))
+
+    def response(self, request: Request, skip: int, limit: int, category: Optional[str] = None) -> Response:
+        body = self.select(skip, limit, category)
+        encoding, content, etag = body.pick(request.headers.get("accept-encoding", ""))
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(self.built_at, usegmt=True),
+            "Cache-Control": f"public, max-age={MENU_CACHE_MAX_AGE}, must-revalidate",
+            "Vary": "Accept-Encoding",
+        }
+        if self._not_modified(request, body):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=content, media_type="application/json", headers=headers)
+
+    def _not_modified(self, request: Request, body: Body) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # Any encoding of the same body counts as a match
+            current = {body.tag, f"{body.tag}-gzip", f"{body.tag}-br", "*"}
+            for tag in if_none_match.split(","):
+                if tag.strip().removeprefix("W/").strip('"') in current:
+                    return True
+            return False
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= int(self.built_at)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+_snapshots = sites.SiteCache("menu_snapshot")
+
+
+def _build(db: Session, version: str) -> MenuSnapshot:
+    items = (
+        db.query(models.MenuItem)
+        .options(selectinload(models.MenuItem.ingredients))
+        .filter(models.MenuItem.site_id == sites.site_id(db))
+        .order_by(models.MenuItem.id)
+        .all()
+    )
+    return MenuSnapshot(items, version)
+
+
+def get_snapshot(db: Session) -> MenuSnapshot:
+    return _snapshots.get_or_build(db, _build)
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models, sites
+
+# How long a computed version is trusted before re-hashing the menu. Other
+# workers writing to the same database are only noticed after this interval.
+VERSION_TTL = float(os.getenv("MENU_VERSION_TTL", "30"))
+
+_HASHED_COLUMNS = (
+    models.MenuItem.id,
+    models.MenuItem.name,
+    models.MenuItem.description,
+    models.MenuItem.price,
+    models.MenuItem.category,
+    models.MenuItem.dietary_tags,
+    models.MenuItem.prep_time,
+    models.MenuItem.safety_alerts,
+    models.MenuItem.may_contain,
+)
+
+_lock = threading.Lock()
+_versions = {}  # site id -> (version, computed at)
+_listeners = []
+
+
+def compute_version(db: Session) -> str:
+    """Hash the site's menu content so any edit yields a new version string."""
+    site = sites.site_id(db)
+    # Seeded with the site so versions (and the cache keys built from them)
+    # never coincide across sites
+    digest = hashlib.sha1(f"site:{site}\n".encode("utf-8"))
+    rows = (
+        db.query(*_HASHED_COLUMNS)
+        .filter(models.MenuItem.site_id == site)
+        .order_by(models.MenuItem.id)
+        .all()
+    )
+    for row in rows:
+        digest.update(repr(tuple(row)).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()[:16]
+
+
+def current(db: Session) -> str:
+    """Return the current menu version of the session's site, recomputing it
+    when stale."""
+    site = sites.site_id(db)
+    with _lock:
+        known = _versions.get(site)
+        if known is not None and time.monotonic() - known[1] < VERSION_TTL:
+            return known[0]
+    version = compute_version(db)
+    with _lock:
+        changed = known is not None and version != known[0]
+        _versions[site] = (version, time.monotonic())
+    if changed:
+        _notify(site)
+    return version
+
+
+def invalidate(site: Optional[int] = None):
+    """Forget the cached version of `site` (every site when None); the next
+    call to current() re-hashes."""
+    with _lock:
+        if site is None:
+            _versions.clear()
+        else:
+            _versions.pop(site, None)
+    _notify(site)
+
+
+def on_change(callback):
+    """Register a callable run with the site ID (None for all sites) whenever
+    that site's menu may have changed."""
+    _listeners.append(callback)
+    return callback
+
+
+def _notify(site: Optional[int]):
+    for callback in list(_listeners):
+        callback(site)
+
+
+# Track menu writes made through any session so callers don't have to
+# remember to invalidate by hand. session.info["menu_changed"] holds the IDs
+# of the sites whose menus were written.
+def mark_changed(session: Session, site: int):
+    session.info.setdefault("menu_changed", set()).add(site)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.MenuItem):
+            mark_changed(session, obj.site_id or sites.DEFAULT_SITE_ID)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _after_bulk(update_context):
+    if update_context.mapper.class_ is models.MenuItem:
+        mark_changed(update_context.session, sites.site_id(update_context.session))
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    for site in session.info.pop("menu_changed", ()):
+        invalidate(site)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("menu_changed", None)
@@ -1,18 +1,53 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, Text, Boolean, DateTime, Index, event, func, inspect, text
+from sqlalchemy.orm import relationship, Session
 from .database import Base
+from . import allergens
 
 item_ingredients = Table(
     "item_ingredients",
     Base.metadata,
     Column("menu_item_id", Integer, ForeignKey("menu_items.id")),
     Column("ingredient_id", Integer, ForeignKey("ingredients.id")),
+    # Bulk ingredient loads look rows up by menu item; the reverse by ingredient
+    Index("ix_item_ingredients_menu_item_id", "menu_item_id", "ingredient_id"),
+    Index("ix_item_ingredients_ingredient_id", "ingredient_id"),
 )
 
+# Rows from before sites existed belong to the first site (see sites.py)
+DEFAULT_SITE_ID = 1
+
+# Indexes replaced in later schema versions, dropped by create_schema
+DROPPED_INDEXES = ("ix_menu_items_filters",)
+
+class Site(Base):
+    # One cafe location; every menu item belongs to exactly one
+    __tablename__ = "sites"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, unique=True, index=True, nullable=False)
+    name = Column(String, nullable=False)
+
+class MenuVersion(Base):
+    # One row per menu import that changed a site's menu
+    __tablename__ = "menu_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    site_id = Column(Integer, ForeignKey("sites.id"), nullable=False)
+    version = Column(String, nullable=False)  # menu_version hash after the import
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    added = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    removed = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_menu_versions_site_id", "site_id", "id"),
+    )
+
 class MenuItem(Base):
     __tablename__ = "menu_items"
 
     id = Column(Integer, primary_key=True, index=True)
+    site_id = Column(Integer, ForeignKey("sites.id"), nullable=False, default=DEFAULT_SITE_ID)
     name = Column(String, index=True)
     description = Column(Text)
     price = Column(Float)
@@ -24,14 +59,90 @@ class MenuItem(Base):
     safety_alerts = Column(Text, nullable=True) # Critical alerts like "NOT VEGAN"
     may_contain = Column(Text, nullable=True) # "May contain: Sesame"
 
+    # Normalized bitmasks (see allergens.py), derived from the text fields on every write
+    allergen_mask = Column(Integer, nullable=False, default=0)
+    may_contain_mask = Column(Integer, nullable=False, default=0)
+    diet_mask = Column(Integer, nullable=False, default=0)
+
     ingredients = relationship("Ingredient", secondary=item_ingredients, back_populates="menu_items")
 
+    __table_args__ = (
+        # Covers a site's category + diet/allergen filters so they're answered from the index alone
+        Index("ix_menu_items_site_filters", "site_id", "category", "diet_mask", "allergen_mask", "may_contain_mask"),
+        # Per-site menu loads and import diffs (matched by name)
+        Index("ix_menu_items_site_name", "site_id", "name"),
+    )
+
 class Ingredient(Base):
     __tablename__ = "ingredients"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     allergens = Column(String) # Comma separated: Gluten, Dairy, etc.
+    allergen_mask = Column(Integer, nullable=False, default=0)
     is_halal = Column(Boolean, default=True)
 
     menu_items = relationship("MenuItem", secondary=item_ingredients, back_populates="ingredients")
+
+class AppState(Base):
+    # Small key/value store; "schema" records the last applied schema version
+    __tablename__ = "app_state"
+
+    key = Column(String, primary_key=True)
+    value = Column(String)
+
+
+@event.listens_for(MenuItem, "before_insert")
+@event.listens_for(MenuItem, "before_update")
+def _set_menu_item_masks(mapper, connection, target):
+    masks = allergens.item_masks(target.name, target.dietary_tags, target.may_contain, target.safety_alerts)
+    for column, value in masks.items():
+        setattr(target, column, value)
+
+
+@event.listens_for(Ingredient, "before_insert")
+@event.listens_for(Ingredient, "before_update")
+def _set_ingredient_mask(mapper, connection, target):
+    target.allergen_mask = allergens.allergen_mask(allergens.parse_allergens(target.allergens))
+
+
+def create_schema(engine):
+    """Create missing tables, plus columns and indexes added to tables that
+    already exist (create_all skips those)."""
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    _backfill_masks(engine)
+    return added
+
+
+def _backfill_masks(engine):
+    # Rows written before the mask columns existed, or under older parsing
+    # rules (e.g. before safety alerts counted); touching them runs the
+    # before_update hooks above
+    with Session(engine) as db:
+        for item in db.query(MenuItem):
+            item.allergen_mask = None
+        for ingredient in db.query(Ingredient):
+            ingredient.allergen_mask = None
+        db.commit()
@@ -1,86 +1,184 @@
 import re
 import json
+from typing import Iterable, Iterator, Union
 
-def parse_menu_dump(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+from pydantic import ValidationError
 
-    items = []
-    current_item = {}
-    
-    # Regex patterns
-    price_pattern = r"£(\d+\.\d+)"
-    
-    # Simple state machine
-    # We look for lines that start with a price or look like an item name
-    
-    # This is a heuristic parser based on the observed format
-    # "Item Name Price Description Contains May Contain / Notes"
-    
-    # Let's try to identify blocks.
-    # Usually: Name -> Price/Desc -> Allergens -> Notes
-    
-    buffer = []
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
+from .schemas import MenuItemCreate
+
+# Patterns for raw allergen-sheet dumps, e.g.
+#
+#   BREAKFAST
+#   Full English Breakfast
+#   £12.95 2 pork sausages, 2 bacon, 1 hash brown,
+#   1 fried egg, beans, tomato, toast.
+#   Contains: Gluten, Eggs, Soya, Sulphur Dioxide
+#   Notes: Soya is in the bread.
+#   Bacon Bap £6.00 Served in a floured bun.
+#   Contains: Gluten
+#   May contain: Sesame (Bun)
+_PRICE = re.compile(r"£\s?(\d+(?:\.\d{1,2})?)")
+_LEADING_PRICE = re.compile(r"^£\s?(\d+(?:\.\d{1,2})?)\s*(.*)$")
+_TABLE_HEADER = re.compile(r"^item name\b.*\bprice\b", re.I)
+_CATEGORY = re.compile(r"^(?:category\s*:\s*(.+)|=+\s*(.+?)\s*=+|#+\s*(.+))$", re.I)
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z &/'-]{2,39}$")
+_CONTAINS = re.compile(r"^(?:contains|allergens)\s*:\s*(.*)$", re.I)
+_MAY_CONTAIN = re.compile(r"^may contain\s*:\s*(.*)$", re.I)
+_NOTES = re.compile(r"^notes?\s*:\s*(.*)$", re.I)
+_ALERT = re.compile(r"^(?:alert|critical|warning|missing data|nut alert)\b.*:", re.I)
+_DIET_MARKERS = re.compile(r"\s*\(((?:VG|V|GF|HALAL)(?:\s*,\s*(?:VG|V|GF|HALAL))*)\)\s*$", re.I)
+_NONE = re.compile(r"^none(?: listed)?\.?$", re.I)
+
+
+class _Item:
+    def __init__(self, name: str, price: str, line: int, category: str):
+        self.line = line
+        self.name = name
+        self.price = price
+        self.category = category
+        self.markers = None
+        self.description = []
+        self.contains = []
+        self.may_contain = []
+        self.notes = []
+        # Where continuation lines go: the field last written
+        self.block = self.description
+
+        marker = _DIET_MARKERS.search(name)
+        if marker:
+            self.name = name[:marker.start()].strip()
+            self.markers = marker.group(1).upper()
+
+    def add_contains(self, text: str):
+        marker = _DIET_MARKERS.search(text)
+        if marker:
+            text = text[:marker.start()].strip()
+            self.markers = marker.group(1).upper()
+        self.contains.append(text)
+        self.block = self.contains
+
+    def record(self) -> MenuItemCreate:
+        contains = " ".join(self.contains).strip()
+        if not contains or _NONE.match(contains):
+            contains = "None Listed"
+        if self.markers:
+            contains += f" ({self.markers})"
+        fields = {
+            "name": self.name,
+            "price": self.price,
+            "description": " ".join(self.description) or None,
+            "category": self.category,
+            "dietary_tags": contains,
+            "may_contain": " ".join(self.may_contain) or None,
+            "safety_alerts": " ".join(self.notes) or None,
+        }
+        try:
+            return MenuItemCreate(**fields)
+        except ValidationError as e:
+            raise ValueError(f"line {self.line}: invalid item {self.name!r}: {e}") from e
+
+
+def parse_menu_dump(source: Union[str, Iterable[str]]) -> Iterator[MenuItemCreate]:
+    """Parse a raw allergen-sheet dump into validated MenuItemCreate records.
+
+    `source` is a file path or any iterable of lines; the file is read one
+    line at a time and items are yielded as soon as they are complete, so
+    dumps of any size stream through in constant memory.
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as f:
+            yield from parse_menu_dump(f)
+        return
+
+    category = None
+    item = None
+    held = []  # text lines whose role depends on the next line
+
+    def release(lines):
+        # Held lines that turned out to continue the current item
+        if item is not None:
+            item.block.extend(lines)
+
+    for number, raw in enumerate(source, 1):
+        line = raw.strip()
+        if not line or _TABLE_HEADER.match(line):
             continue
-            
-        # Skip headers
-        if "Item Name Price" in line:
+
+        match = _CATEGORY.match(line)
+        if match or _CAPS_HEADING.match(line):
+            release(held)
+            held = []
+            if item is not None:
+                yield item.record()
+                item = None
+            heading = next((g for g in match.groups() if g), line) if match else line
+            category = heading.strip().title()
             continue
-            
-        # Detect price line (often starts with £ or contains it early)
-        price_match = re.search(price_pattern, line)
-        
-        if price_match:
-            # If we have a price, it's likely the start of a new item OR the description line of the previous item name
-            # Looking at the dump:
-            # 109: Full English Breakfast 
-            # 110: £12.95 2 pork sausages...
-            
-            # So if we have a buffer, the buffer is likely the Name.
-            if buffer:
-                name = " ".join(buffer).strip()
-                current_item = {"name": name}
-                buffer = []
-                
-                # Extract price
-                current_item["price"] = float(price_match.group(1))
-                
-                # Description is often on the same line as price, after the price
-                # "£12.95 2 pork sausages..."
-                desc_part = line.split(price_match.group(0), 1)[1].strip()
-                current_item["description"] = desc_part
-                
-                items.append(current_item)
+
+        block = _CONTAINS.match(line) or _MAY_CONTAIN.match(line) or _NOTES.match(line) or _ALERT.match(line)
+        if block:
+            if item is None:
+                raise ValueError(f"line {number}: {line!r} before any item")
+            release(held)
+            held = []
+            if block.re is _CONTAINS:
+                item.add_contains(block.group(1))
+            elif block.re is _MAY_CONTAIN:
+                item.may_contain.append(block.group(1))
+                item.block = item.may_contain
+            elif block.re is _NOTES:
+                item.notes.append(block.group(1))
+                item.block = item.notes
             else:
-                # Price line without a preceding name buffer? 
-                # Maybe the name was on the same line? "Bacon Bap £6.00 Served..."
-                # Let's handle that case if needed, but the dump seems to split them often.
-                pass
-        
-        elif "Contains" in line or "Gluten" in line or "Milk" in line:
-             # Likely allergen line
-             if items:
-                 items[-1]["dietary_tags"] = line # Store raw string for now
-        
-        elif "May contain" in line or "Notes" in line or "ALERT" in line:
-            if items:
-                items[-1]["may_contain"] = line
-        
-        else:
-            # Just text, maybe name?
-            buffer.append(line)
+                item.notes.append(line)
+                item.block = item.notes
+            continue
+
+        leading = _LEADING_PRICE.match(line)
+        if leading:
+            # "£12.95 description": the name was on the line(s) before
+            if not held:
+                raise ValueError(f"line {number}: price without an item name")
+            if item is not None:
+                release(held[:-1])
+                name = held[-1]
+                yield item.record()
+            else:
+                name = " ".join(held)
+            item = _Item(name, leading.group(1), number, category)
+            if leading.group(2):
+                item.description.append(leading.group(2))
+            held = []
+            continue
+
+        price = _PRICE.search(line)
+        if price and line[:price.start()].strip():
+            # "Bacon Bap £6.00 description" on one line
+            release(held)
+            held = []
+            if item is not None:
+                yield item.record()
+            item = _Item(line[:price.start()].strip(), price.group(1), number, category)
+            rest = line[price.end():].strip()
+            if rest:
+                item.description.append(rest)
+            continue
+
+        if item is not None and item.block and item.block[-1].endswith(","):
+            # Wrapped list, e.g. a long "Contains:" line
+            item.block.append(line)
+            continue
+        held.append(line)
+
+    release(held)
+    if item is not None:
+        yield item.record()
 
-    return items
 
-# Since the dump is messy, let's try a more robust approach using the line numbers from the view_file output as a guide
-# 109: Full English Breakfast 
-# 110: £12.95 ...
-# 111: Gluten...
-# 112: Soya...
+def parse_dumps(paths: Iterable[str]) -> Iterator[MenuItemCreate]:
+    """Records from several dumps in one pass, e.g. one per site."""
+    for path in paths:
+        yield from parse_menu_dump(path)
 
 def parse_structured():
     items = []
@@ -0,0 +1,131 @@
+"""Order pricing.
+
+The model (or any other caller) only chooses items and quantities; line
+totals, the order total and the answer text are computed here from
+MenuItem.price with Decimal arithmetic, so they are always exact.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, NamedTuple, Optional
+
+# Items sold as extras on another item (e.g. a latte with oat milk)
+ADDON_NAMES = {"Oat Milk", "Almond Milk", "Hazelnut Syrup"}
+# Guard against runaway quantities from a confused model
+MAX_QUANTITY = 50
+
+PENNY = Decimal("0.01")
+
+
+class Selection(NamedTuple):
+    id: int
+    quantity: int
+    addons: tuple = ()
+
+
+class Line(NamedTuple):
+    item: object  # models.MenuItem
+    quantity: int
+    unit_price: Decimal
+    total: Decimal
+    addons: tuple = ()  # Lines for the add-ons on this item
+
+
+class Order(NamedTuple):
+    lines: List[Line]
+    total: Decimal
+
+    @property
+    def ids(self) -> List[int]:
+        """Item IDs in display order, add-ons after the item they go with."""
+        ids = []
+        for line in self.lines:
+            for entry in (line,) + line.addons:
+                if entry.item.id not in ids:
+                    ids.append(entry.item.id)
+        return ids
+
+
+def money(value) -> Decimal:
+    # str() first so 12.95 stays 12.95 rather than its binary float expansion
+    return Decimal(str(value or 0)).quantize(PENNY, rounding=ROUND_HALF_UP)
+
+
+def _int(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return None
+
+
+def parse_selections(raw) -> List[Selection]:
+    """Selections from model output: [{"id", "quantity", "addons"}], or a
+    bare list of IDs meaning one of each. Malformed entries are dropped and
+    matching selections merged."""
+    merged = {}
+    for entry in raw if isinstance(raw, list) else []:
+        if isinstance(entry, dict):
+            item_id = _int(entry.get("id"))
+            quantity = _int(entry.get("quantity", 1))
+            addons = entry.get("addons") or []
+            addons = tuple(sorted({a for a in map(_int, addons if isinstance(addons, list) else []) if a is not None}))
+        else:
+            item_id, quantity, addons = _int(entry), 1, ()
+        if item_id is None or quantity is None or quantity < 1:
+            continue
+        key = (item_id, addons)
+        merged[key] = min(merged.get(key, 0) + quantity, MAX_QUANTITY)
+    return [Selection(item_id, quantity, addons) for (item_id, addons), quantity in merged.items()]
+
+
+def selection_ids(selections: List[Selection]) -> List[int]:
+    ids = []
+    for selection in selections:
+        for item_id in (selection.id,) + selection.addons:
+            if item_id not in ids:
+                ids.append(item_id)
+    return ids
+
+
+def _line(item, quantity: int, addons=()) -> Line:
+    unit = money(item.price)
+    return Line(item, quantity, unit, unit * quantity, tuple(addons))
+
+
+def price_order(items: Dict[int, object], selections: List[Selection]) -> Order:
+    """Price `selections` against `items` (id -> MenuItem). Unknown IDs are
+    skipped; add-ons are charged once per unit of the item they go with."""
+    lines = []
+    for selection in selections:
+        item = items.get(selection.id)
+        if item is None:
+            continue
+        addons = [
+            _line(items[a], selection.quantity)
+            for a in selection.addons
+            if a in items and items[a].name in ADDON_NAMES
+        ]
+        lines.append(_line(item, selection.quantity, addons))
+    total = sum((entry.total for line in lines for entry in (line,) + line.addons), Decimal("0.00"))
+    return Order(lines, total)
+
+
+def render(order: Order) -> str:
+    """Answer text, one line per item and add-on, then the total:
+
+        2 x Latte / Cappuccino @ £3.70 = £7.40
+          + 2 x Oat Milk @ £0.60 = £1.20
+
+        Total: £8.60
+    """
+    if not order.lines:
+        return ""
+    rows = []
+    for line in order.lines:
+        rows.append(f"{line.quantity} x {line.item.name} @ £{line.unit_price} = £{line.total}")
+        for addon in line.addons:
+            rows.append(f"  + {addon.quantity} x {addon.item.name} @ £{addon.unit_price} = £{addon.total}")
+    return "\n".join(rows) + f"\n\nTotal: £{order.total}"
@@ -0,0 +1,128 @@
+"""Append-only log of searches, for offline analysis (see analytics.py).
+
+record() only enqueues; a background thread drains the queue and appends
+batches of compact JSON lines to QUERY_LOG_PATH, one write per batch. Matched
+item IDs are pulled out of the response body on that thread too, so the
+request path does no extra serialization or I/O. When the queue is full
+entries are dropped (and counted) rather than slowing searches down.
+
+One line per search:
+
+    {"t":1760745600.123,"s":1,"q":"vegan breakfast for 2","p":"llm","ms":812.4,"ids":[3,7]}
+
+t = unix time, s = site ID, p = path (cache, local, llm, llm_invalid,
+fallback, fulltext), ms = duration, ids = matched items in order.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from . import metrics
+from .log import log_event
+
+# Empty disables the log
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "./query_log.jsonl")
+QUERY_LOG_BATCH = int(os.getenv("QUERY_LOG_BATCH", "200"))
+# Seconds an entry may wait for its batch to fill before it's written anyway
+QUERY_LOG_FLUSH_INTERVAL = float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", "1.0"))
+QUERY_LOG_QUEUE_SIZE = int(os.getenv("QUERY_LOG_QUEUE_SIZE", "10000"))
+
+_STOP = object()
+
+
+def _ids(body: Optional[str]) -> List[int]:
+    try:
+        return [item["id"] for item in json.loads(body)["items"]]
+    except (TypeError, ValueError, KeyError):
+        return []
+
+
+def encode(t: float, site: int, q: str, path: str, duration_ms: float, body: Optional[str], ids) -> str:
+    entry = {
+        "t": round(t, 3),
+        "s": site,
+        "q": q.strip(),
+        "p": path,
+        "ms": duration_ms,
+        "ids": list(ids) if ids is not None else _ids(body),
+    }
+    return json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+class QueryLog:
+    def __init__(self, path: str, batch_size: int, flush_interval: float, queue_size: int):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, site: int, q: str, path: str, duration_ms: float, body: Optional[str] = None, ids=None):
+        """Queue one search for the log. Pass the serialized response as
+        `body`, or the matched `ids` when there is no body."""
+        if not self.path:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), site, q, path, duration_ms, body, ids))
+        except queue.Full:
+            metrics.query_log_entries.inc(outcome="dropped")
+
+    def _start(self):
+        # Started lazily so each worker process gets its own writer thread
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            self._write([entry for entry in batch if entry is not _STOP])
+            if stop:
+                return
+
+    def _write(self, batch):
+        if not batch:
+            return
+        lines = "".join(encode(*entry) for entry in batch)
+        try:
+            # One O_APPEND write per batch, so workers sharing the file don't
+            # interleave within a line
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            metrics.query_log_entries.inc(len(batch), outcome="dropped")
+            log_event("query_log_error", logging.WARNING, path=self.path, error=str(e))
+            return
+        metrics.query_log_entries.inc(len(batch), outcome="written")
+
+    def close(self, timeout: float = 5.0):
+        """Write out whatever is queued and stop the writer thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+
+query_log = QueryLog(QUERY_LOG_PATH, QUERY_LOG_BATCH, QUERY_LOG_FLUSH_INTERVAL, QUERY_LOG_QUEUE_SIZE)
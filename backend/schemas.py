@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class IngredientBase(BaseModel):
@@ -35,6 +35,19 @@ class MenuItem(MenuItemBase):
     class Config:
         from_attributes = True
 
+class Site(BaseModel):
+    slug: str
+    name: str
+
+    class Config:
+        from_attributes = True
+
 class SearchResponse(BaseModel):
     items: List[MenuItem]
     answer: Optional[str] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1)
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
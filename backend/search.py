@@ -0,0 +1,609 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import aclosing
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+
+from . import models, schemas, database, fulltext, llm, metrics, menu_version, pricing, search_index, menu_context, sites, vector_index
+from .log import log_event
+from .query_log import query_log
+from .search_cache import search_cache, make_key, normalize_query
+
+# Drop cached answers as soon as the menu is reseeded or edited
+menu_version.on_change(search_cache.clear)
+
+metrics.register_gauges(
+    "flavorly_search_cache",
+    "Search answer cache size and hit/miss/eviction counts.",
+    lambda: [({"stat": k}, v) for k, v in search_cache.info().items() if isinstance(v, (int, float))],
+)
+
+BUSY_ANSWER = "Our assistant is busy right now, so here are the closest matches on the menu."
+PARSE_ERROR_ANSWER = "I found some items but couldn't process them perfectly. Please try again."
+MISSING_ANSWER = "I couldn't answer that one properly, so here are the closest matches on the menu."
+
+# Batch searches: most queries accepted per request, and model-bound queries
+# answered together in one Gemini call
+BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "20"))
+BATCH_LLM_SIZE = int(os.getenv("SEARCH_BATCH_LLM_SIZE", "5"))
+
+
+class SearchPlan(NamedTuple):
+    q: str
+    cache_key: str
+    index: search_index.MenuIndex
+    body: Optional[str]  # serialized SearchResponse when no model call is needed
+    path: Optional[str]  # "cache" or "local" when body is set
+    prompt: Optional[str]
+
+
+def items_by_ids(db: Session, ids: List[int]):
+    """Load the site's menu items by ID, keeping the order of `ids`."""
+    if not ids:
+        return []
+    with metrics.stage("result_query"):
+        rows = (
+            db.query(models.MenuItem)
+            .options(selectinload(models.MenuItem.ingredients))
+            # Site filter: a model reply may name IDs from another site's menu
+            .filter(models.MenuItem.id.in_(ids), models.MenuItem.site_id == sites.site_id(db))
+            .all()
+        )
+    by_id = {item.id: item for item in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+# Shared by the single and batch prompts
+ANSWER_RULES = """1. Identify the menu items that best match the request.
+    2. If the user asks for a meal plan or suggestion, select specific items.
+    3. If the user specifies a quantity (e.g. "3 people" or "3 breakfasts"), assume they want that quantity for ALL requested items (like drinks) unless they say otherwise.
+    4. Handle mixed dietary requests (e.g. "3 meals, one vegan"). Select items that satisfy EACH person's requirement.
+    5. Milk alternatives and syrups (Oat Milk, Almond Milk, Hazelnut Syrup) are add-ons: put their ids in the "addons" of the drink they go with.
+    6. Only choose items and quantities. Do not calculate prices or totals; they are added for you."""
+
+# Shape of one answer in the model's reply
+SELECTION_FORMAT = """- "items": Array of objects, one per selected item: {"id": integer, "quantity": integer, "addons": array of add-on ids (optional)}.
+    - "note": String (one brief friendly sentence; no prices)."""
+
+
+def build_prompt(q: str, menu_json: str) -> str:
+    return f"""
+    You are a helpful waiter at Prom Cafe.
+    {menu_context.LEGEND}
+    Here is the menu: {menu_json}
+
+    The customer asks: "{q}"
+
+    Task:
+    {ANSWER_RULES}
+
+    Return a JSON object with two keys, in this order:
+    {SELECTION_FORMAT}
+
+    Example: {{ "items": [{{ "id": 1, "quantity": 3 }}], "note": "A hearty start for all three of you!" }}
+    """
+
+
+def build_batch_prompt(queries: List[str], menu_json: str) -> str:
+    numbered = "\n    ".join(f'{n}. "{q}"' for n, q in enumerate(queries, 1))
+    return f"""
+    You are a helpful waiter at Prom Cafe.
+    {menu_context.LEGEND}
+    Here is the menu: {menu_json}
+
+    Several customers ask, one numbered request each:
+    {numbered}
+
+    Task, for each request separately:
+    {ANSWER_RULES}
+
+    Return a JSON object with one key, "results": an array with one object per
+    request, in the same order, each with three keys:
+    - "n": Integer (the request number).
+    {SELECTION_FORMAT}
+
+    Example: {{ "results": [{{ "n": 1, "items": [{{ "id": 1, "quantity": 1 }}], "note": "Enjoy!" }}] }}
+    """
+
+
+def serialize(response: schemas.SearchResponse) -> str:
+    with metrics.stage("serialize"):
+        return response.model_dump_json()
+
+
+def prompt_menu(db: Session, context: menu_context.MenuContext, q: str, index: search_index.MenuIndex) -> str:
+    """Menu JSON for one query: the vector-retrieved candidates (from the
+    categories the query hints at) when there are any, otherwise those
+    whole categories."""
+    categories, excluded = context.categories_for(q, index), context.excluded_for(q, index)
+    with metrics.stage("retrieval"):
+        candidates = vector_index.candidates_for(db, q, index, categories)
+    if candidates is not None:
+        return context.render_items(candidates, excluded)
+    return context.render(categories, excluded)
+
+
+def plan_search(db: Session, q: str, with_prompt: bool = True) -> SearchPlan:
+    """Answer from the cache or local index if possible, else prepare the prompt
+    (skipped with `with_prompt=False`, for batches that share one)."""
+    with metrics.stage("menu_load"):
+        cache_key = make_key(q, menu_version.current(db), sites.site_id(db))
+        index = search_index.get_index(db)
+    with metrics.stage("cache_lookup"):
+        cached = search_cache.get(cache_key)
+    if cached is not None:
+        return SearchPlan(q, cache_key, index, cached, "cache", None)
+
+    # Plain keyword, category and allergen lookups are answered from the
+    # local index; only conversational requests go to Gemini
+    with metrics.stage("local_search"):
+        local = index.answer(q)
+    if local is not None:
+        body = serialize(schemas.SearchResponse(items=items_by_ids(db, local.ids), answer=local.answer))
+        search_cache.set(cache_key, body)
+        return SearchPlan(q, cache_key, index, body, "local", None)
+
+    if not with_prompt:
+        return SearchPlan(q, cache_key, index, None, None, None)
+
+    # Compact menu context, pre-serialized once per menu version
+    with metrics.stage("prompt_build"):
+        prompt = build_prompt(q, prompt_menu(db, menu_context.get_context(db), q, index))
+    return SearchPlan(q, cache_key, index, None, None, prompt)
+
+
+def extract_json(text_response: str) -> dict:
+    """Pull the {"items", "note"} object out of a model reply.
+
+    Raises json.JSONDecodeError for malformed JSON and ValueError when no
+    JSON is present at all.
+    """
+    # Find the first { and last }
+    start_idx = text_response.find('{')
+    end_idx = text_response.rfind('}')
+
+    if start_idx != -1 and end_idx != -1:
+        return json.loads(text_response[start_idx:end_idx+1])
+
+    # Try parsing as list if it returned just a list
+    start_idx_list = text_response.find('[')
+    end_idx_list = text_response.rfind(']')
+    if start_idx_list != -1 and end_idx_list != -1:
+        items = json.loads(text_response[start_idx_list:end_idx_list+1])
+        return {"items": items, "note": "Here are some suggestions."}
+    raise ValueError("No JSON found")
+
+
+def compose_answer(order_text: str, note: Optional[str]) -> str:
+    return "\n\n".join(part for part in (order_text, (note or "").strip()) if part)
+
+
+def priced_response(db: Session, raw_items, note: Optional[str] = None) -> schemas.SearchResponse:
+    """Price the model's {"id", "quantity", "addons"} selections and render
+    the answer text server-side."""
+    selections = pricing.parse_selections(raw_items)
+    items = items_by_ids(db, pricing.selection_ids(selections))
+    by_id = {item.id: item for item in items}
+    with metrics.stage("pricing"):
+        order = pricing.price_order(by_id, selections)
+        answer = compose_answer(pricing.render(order), note)
+    return schemas.SearchResponse(items=[by_id[i] for i in order.ids], answer=answer)
+
+
+def _selected(data: dict):
+    # "ids" is accepted from replies in the older format
+    return data.get("items", data.get("ids", []))
+
+
+def complete_search(db: Session, plan: SearchPlan, text_response: str):
+    """Turn the model reply into (body, path), caching it on success."""
+    log_event("llm_response", logging.DEBUG, q=plan.q, text=text_response)
+    try:
+        with metrics.stage("json_extract"):
+            data = extract_json(text_response)
+    except json.JSONDecodeError:
+        metrics.json_parse_failures.inc()
+        log_event("llm_json_invalid", logging.WARNING, q=plan.q, text=text_response[:500])
+        return serialize(schemas.SearchResponse(items=[], answer=PARSE_ERROR_ANSWER)), "llm_invalid"
+    except ValueError as e:
+        metrics.json_parse_failures.inc()
+        log_event("llm_json_missing", logging.WARNING, q=plan.q, error=str(e))
+        return local_fallback(db, plan, f"AI Error: {e}", "no_json"), "fallback"
+
+    body = serialize(priced_response(db, _selected(data), data.get("note")))
+    search_cache.set(plan.cache_key, body)
+    return body, "llm"
+
+
+def local_fallback(db: Session, plan: SearchPlan, answer: str, reason: str) -> str:
+    # Fallback to a ranked local search
+    metrics.search_fallbacks.inc(reason=reason)
+    with metrics.stage("local_search"):
+        ids = plan.index.search(plan.index.parse(plan.q))
+    return serialize(schemas.SearchResponse(items=items_by_ids(db, ids), answer=answer))
+
+
+async def _ask_model(db: Session, plan: SearchPlan):
+    try:
+        with metrics.stage("llm_call"):
+            text_response = await llm.generate(plan.prompt, key=plan.cache_key)
+    except llm.LLMUnavailable as e:
+        log_event("llm_unavailable", logging.WARNING, q=plan.q, reason=e.reason, error=str(e))
+        return await run_in_threadpool(local_fallback, db, plan, BUSY_ANSWER, e.reason), "fallback"
+    except Exception as e:
+        log_event("llm_error", logging.ERROR, q=plan.q, error=str(e))
+        return await run_in_threadpool(local_fallback, db, plan, f"AI Error: {str(e)}", "error"), "fallback"
+    return await run_in_threadpool(complete_search, db, plan, text_response)
+
+
+def record_search(db: Session, q: str, path: str, started: float, timings: dict, body: Optional[str] = None, ids=None, **fields):
+    """Count the search by path, write its structured log line and queue it
+    for the query log (`body` is the serialized response, or pass `ids`)."""
+    duration_ms = round((time.perf_counter() - started) * 1000, 3)
+    metrics.search_requests.inc(path=path)
+    log_event("search", q=q, path=path, duration_ms=duration_ms, stages=timings, **fields)
+    query_log.record(sites.site_id(db), q, path, duration_ms, body=body, ids=ids)
+
+
+async def run_search(db: Session, q: str) -> str:
+    """Full search for `q`, returning the serialized SearchResponse."""
+    started = time.perf_counter()
+    timings = metrics.start_timings()
+    # DB work runs in the threadpool; the model call is awaited on the event
+    # loop so slow Gemini responses don't pin worker threads
+    plan = await run_in_threadpool(plan_search, db, q)
+    if plan.body is not None:
+        body, path = plan.body, plan.path
+    else:
+        body, path = await _ask_model(db, plan)
+    record_search(db, q, path, started, timings, body=body)
+    return body
+
+
+_ITEMS_FIELD = re.compile(r'"items"\s*:\s*\[')
+_NOTE_FIELD = re.compile(r'"note"\s*:\s*"')
+
+
+def _array_end(text: str, start: int) -> Optional[int]:
+    """Index just past the JSON array opening at text[start], or None if it
+    hasn't closed yet."""
+    depth, in_string, escaped = 0, False, False
+    for pos in range(start, len(text)):
+        char = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+    return None
+
+
+class StreamingAnswerParser:
+    """Incrementally picks the selections and note out of a streamed model reply.
+
+    feed() returns the selected items (once the "items" array has closed) and
+    the newly decoded slice of the "note" string, so both can be forwarded
+    to the client before the reply is complete.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.items = None
+        self.answer = ""  # the note text decoded so far
+        self.answer_done = False
+        self._answer_pos = None
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        new_items = None
+        if self.items is None:
+            match = _ITEMS_FIELD.search(self.buffer)
+            if match:
+                end = _array_end(self.buffer, match.end() - 1)
+                if end is not None:
+                    try:
+                        self.items = json.loads(self.buffer[match.end() - 1:end])
+                    except json.JSONDecodeError:
+                        self.items = []
+                    new_items = self.items
+        return new_items, self._read_answer()
+
+    def _read_answer(self) -> str:
+        if self.answer_done:
+            return ""
+        if self._answer_pos is None:
+            match = _NOTE_FIELD.search(self.buffer)
+            if not match:
+                return ""
+            self._answer_pos = match.end()
+
+        pos, raw = self._answer_pos, []
+        while pos < len(self.buffer):
+            char = self.buffer[pos]
+            if char == '"':
+                self.answer_done = True
+                pos += 1
+                break
+            if char == "\\":
+                # Wait for the rest of an escape sequence split across chunks
+                width = 6 if self.buffer[pos + 1:pos + 2] == "u" else 2
+                if pos + width > len(self.buffer):
+                    break
+                raw.append(self.buffer[pos:pos + width])
+                pos += width
+                continue
+            raw.append(char)
+            pos += 1
+        self._answer_pos = pos
+
+        try:
+            delta = json.loads('"' + "".join(raw) + '"', strict=False)
+        except json.JSONDecodeError:
+            delta = "".join(raw)
+        self.answer += delta
+        return delta
+
+
+def sse(event: str, data) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def fulltext_search(db: Session, q: str) -> str:
+    """Ranked full-text match on the database index; no query parsing or model call."""
+    try:
+        with metrics.stage("fulltext"):
+            ids = fulltext.search(db, q)
+    except SQLAlchemyError as e:
+        # No full-text index (e.g. SQLite without FTS5); rank in memory instead
+        log_event("fulltext_error", logging.WARNING, q=q, error=str(e))
+        db.rollback()
+        index = search_index.get_index(db)
+        with metrics.stage("local_search"):
+            ids = index.search(index.parse(q))
+    items = items_by_ids(db, ids)
+    parsed = search_index.ParsedQuery([q.strip()], [], set(), set(), set(), False)
+    return serialize(schemas.SearchResponse(items=items, answer=search_index.describe(parsed, len(items))))
+
+
+async def run_fulltext(db: Session, q: str) -> str:
+    started = time.perf_counter()
+    timings = metrics.start_timings()
+    body = await run_in_threadpool(fulltext_search, db, q)
+    record_search(db, q, "fulltext", started, timings, body=body)
+    return body
+
+
+def batch_prompt(db: Session, plans: List[SearchPlan]) -> str:
+    """One prompt for several queries, over the union of the menu sections
+    they need (minus allergens every one of them excludes)."""
+    with metrics.stage("prompt_build"):
+        context = menu_context.get_context(db)
+        if len(plans) == 1:
+            return build_prompt(plans[0].q, prompt_menu(db, context, plans[0].q, plans[0].index))
+        categories, candidates, excluded = set(), [], -1
+        for plan in plans:
+            wanted = context.categories_for(plan.q, plan.index)
+            categories = None if wanted is None or categories is None else categories | wanted
+            if candidates is not None:
+                with metrics.stage("retrieval"):
+                    found = vector_index.candidates_for(db, plan.q, plan.index, wanted)
+                candidates = None if found is None else candidates + found
+            excluded &= context.excluded_for(plan.q, plan.index)
+        if candidates is not None:
+            return build_batch_prompt([plan.q for plan in plans], context.render_items(candidates, excluded))
+        return build_batch_prompt([plan.q for plan in plans], context.render(categories, excluded))
+
+
+def parse_batch(text_response: str, count: int) -> dict:
+    """{request number: {"items", "note"}} from a batch reply; requests the
+    model skipped or mangled are left out."""
+    data = extract_json(text_response)
+    results = data.get("results") if isinstance(data, dict) else None
+    parsed = {}
+    for position, result in enumerate(results if isinstance(results, list) else [], 1):
+        if not isinstance(result, dict) or ("items" not in result and "ids" not in result):
+            continue
+        n = result.get("n", position)
+        if isinstance(n, int) and 1 <= n <= count:
+            parsed[n] = result
+    return parsed
+
+
+def complete_batch(db: Session, plans: List[SearchPlan], text_response: str):
+    """[(body, path)] for each plan, caching the answers the model gave."""
+    if len(plans) == 1:
+        return [complete_search(db, plans[0], text_response)]
+    log_event("llm_response", logging.DEBUG, q=[plan.q for plan in plans], text=text_response)
+    try:
+        with metrics.stage("json_extract"):
+            results = parse_batch(text_response, len(plans))
+    except ValueError as e:
+        # JSONDecodeError included: every query in the call falls back
+        metrics.json_parse_failures.inc()
+        log_event("llm_json_invalid", logging.WARNING, q=[plan.q for plan in plans], error=str(e))
+        results = {}
+    out = []
+    for n, plan in enumerate(plans, 1):
+        result = results.get(n)
+        if result is None:
+            out.append((local_fallback(db, plan, MISSING_ANSWER, "batch_missing"), "fallback"))
+            continue
+        body = serialize(priced_response(db, _selected(result), result.get("note")))
+        search_cache.set(plan.cache_key, body)
+        out.append((body, "llm"))
+    return out
+
+
+def _plan_batch(db: Session, queries: List[str]):
+    plans = [plan_search(db, q, with_prompt=False) for q in queries]
+    pending = [plan for plan in plans if plan.body is None]
+    chunks = [pending[i:i + BATCH_LLM_SIZE] for i in range(0, len(pending), BATCH_LLM_SIZE)]
+    return plans, chunks, [batch_prompt(db, chunk) for chunk in chunks]
+
+
+def _complete_chunks(db: Session, chunks, replies):
+    resolved = {}
+    for chunk, reply in zip(chunks, replies):
+        if isinstance(reply, llm.LLMUnavailable):
+            log_event("llm_unavailable", logging.WARNING, q=[plan.q for plan in chunk], reason=reply.reason, error=str(reply))
+            results = [(local_fallback(db, plan, BUSY_ANSWER, reply.reason), "fallback") for plan in chunk]
+        elif isinstance(reply, BaseException):
+            log_event("llm_error", logging.ERROR, q=[plan.q for plan in chunk], error=str(reply))
+            results = [(local_fallback(db, plan, f"AI Error: {str(reply)}", "error"), "fallback") for plan in chunk]
+        else:
+            results = complete_batch(db, chunk, reply)
+        for plan, result in zip(chunk, results):
+            resolved[plan.cache_key] = result
+    return resolved
+
+
+async def run_batch(db: Session, queries: List[str]) -> str:
+    """Answer many queries at once, returning a serialized BatchSearchResponse
+    with one result per query, in order.
+
+    Duplicates are answered once, cached and local answers never reach the
+    model, and the rest share BATCH_LLM_SIZE-query Gemini calls that run
+    concurrently.
+    """
+    started = time.perf_counter()
+    timings = metrics.start_timings()
+    unique = {}
+    for q in queries:
+        unique.setdefault(normalize_query(q), q)
+    plans, chunks, prompts = await run_in_threadpool(_plan_batch, db, list(unique.values()))
+
+    async def ask(prompt, chunk):
+        with metrics.stage("llm_call"):
+            return await llm.generate(prompt, key="batch:" + "|".join(plan.cache_key for plan in chunk))
+
+    replies = await asyncio.gather(*(ask(p, c) for p, c in zip(prompts, chunks)), return_exceptions=True)
+    resolved = await run_in_threadpool(_complete_chunks, db, chunks, replies)
+
+    answers, paths = {}, Counter()
+    for plan in plans:
+        body, path = (plan.body, plan.path) if plan.body is not None else resolved[plan.cache_key]
+        answers[normalize_query(plan.q)] = (body, path)
+        paths[path] += 1
+        metrics.search_requests.inc(path=path)
+    duration_ms = round((time.perf_counter() - started) * 1000, 3)
+    log_event(
+        "search_batch",
+        queries=len(queries),
+        unique=len(plans),
+        llm_calls=len(chunks),
+        paths=dict(paths),
+        duration_ms=duration_ms,
+        stages=timings,
+    )
+    site = sites.site_id(db)
+    for q in queries:
+        # Every query, duplicates included, so demand counts stay true
+        body, path = answers[normalize_query(q)]
+        query_log.record(site, q, path, duration_ms, body=body)
+    return '{"results":[' + ",".join(answers[normalize_query(q)][0] for q in queries) + "]}"
+
+
+def _items_payload(items):
+    return [schemas.MenuItem.model_validate(item).model_dump(mode="json") for item in items]
+
+
+def _body_events(body: str):
+    data = json.loads(body)
+    yield sse("items", data["items"])
+    yield sse("done", {"answer": data["answer"]})
+
+
+async def stream_events(q: str, site: int = sites.DEFAULT_SITE_ID):
+    """Search for `q`, yielding SSE events as results become known.
+
+    Events: "items" (full list of matched items, may be re-sent), "answer"
+    ({"delta": text} as the model writes it) and a final "done" carrying the
+    complete answer.
+    """
+    started = time.perf_counter()
+    timings = metrics.start_timings()
+    # Own session: the response outlives the request's dependencies
+    db = sites.use_site(database.ReadSessionLocal(), site)
+    try:
+        plan = await run_in_threadpool(plan_search, db, q)
+        if plan.body is not None:
+            for event in _body_events(plan.body):
+                yield event
+            record_search(db, q, plan.path, started, timings, body=plan.body, stream=True)
+            return
+
+        parser = StreamingAnswerParser()
+        priced = None
+        last_part = None  # "order" or "note": the answer part streamed last
+        first_byte = None
+        try:
+            with metrics.stage("llm_call"):
+                async with aclosing(llm.stream(plan.prompt)) as chunks:
+                    async for chunk in chunks:
+                        if first_byte is None:
+                            first_byte = round((time.perf_counter() - started) * 1000, 3)
+                        new_items, delta = parser.feed(chunk)
+                        parts = []
+                        if new_items is not None:
+                            # Priced as soon as the selections are in; the note streams after
+                            priced = await run_in_threadpool(priced_response, db, new_items)
+                            yield sse("items", _items_payload(priced.items))
+                            parts.append(("order", priced.answer))
+                        parts.append(("note", delta))
+                        for part, text in parts:
+                            if not text:
+                                continue
+                            if last_part is not None and last_part != part:
+                                text = "\n\n" + text
+                            last_part = part
+                            yield sse("answer", {"delta": text})
+        except llm.LLMUnavailable as e:
+            log_event("llm_unavailable", logging.WARNING, q=q, reason=e.reason, error=str(e))
+            body = await run_in_threadpool(local_fallback, db, plan, BUSY_ANSWER, e.reason)
+            for event in _body_events(body):
+                yield event
+            record_search(db, q, "fallback", started, timings, body=body, stream=True)
+            return
+        except Exception as e:
+            log_event("llm_error", logging.ERROR, q=q, error=str(e))
+            body = await run_in_threadpool(local_fallback, db, plan, f"AI Error: {str(e)}", "error")
+            for event in _body_events(body):
+                yield event
+            record_search(db, q, "fallback", started, timings, body=body, stream=True)
+            return
+
+        if parser.items is None or not parser.answer_done:
+            # The reply didn't have the expected shape; parse it as a whole
+            body, path = await run_in_threadpool(complete_search, db, plan, parser.buffer)
+            for event in _body_events(body):
+                yield event
+            record_search(db, q, path, started, timings, body=body, stream=True, first_chunk_ms=first_byte)
+            return
+
+        log_event("llm_response", logging.DEBUG, q=q, text=parser.buffer)
+        # priced.answer holds the order lines; the note goes after them
+        response = schemas.SearchResponse(items=priced.items, answer=compose_answer(priced.answer, parser.answer))
+        search_cache.set(plan.cache_key, serialize(response))
+        yield sse("done", {"answer": response.answer})
+        record_search(db, q, "llm", started, timings, ids=[item.id for item in priced.items], stream=True, first_chunk_ms=first_byte)
+    finally:
+        db.close()
@@ -0,0 +1,209 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Cache settings, all overridable from the environment
+CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")  # "memory" or "sqlite"
+CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "./search_cache.db")
+
+_WORD = re.compile(r"[a-z0-9£.]+")
+
+
+def normalize_query(q: str) -> str:
+    """Collapse case, punctuation and whitespace so trivially different
+    phrasings ("Vegan options?" / "vegan  options") share one entry."""
+    return " ".join(_WORD.findall(q.lower())).strip(" .")
+
+
+def make_key(q: str, menu_version: str, site: int) -> str:
+    # Site first, so one site's entries can be dropped by prefix
+    return f"{site}:{menu_version}:{normalize_query(q)}"
+
+
+def site_prefix(site: int) -> str:
+    return f"{site}:"
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class MemoryBackend:
+    """Bounded LRU held in the worker process."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key, value, created):
+        self._data[key] = (value, created)
+        self._data.move_to_end(key)
+        evicted = 0
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """Bounded LRU stored in a local SQLite file so it survives worker restarts
+    and is shared by every worker on the host."""
+
+    def __init__(self, max_size: int, path: str):
+        self.max_size = max_size
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_search_cache_accessed ON search_cache (accessed)"
+        )
+
+    def get(self, key):
+        row = self._conn.execute(
+            "SELECT value, created FROM search_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self._conn.execute(
+                "UPDATE search_cache SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return row
+
+    def set(self, key, value, created):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO search_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, value, created, time.time()),
+        )
+        overflow = len(self) - self.max_size
+        if overflow <= 0:
+            return 0
+        self._conn.execute(
+            "DELETE FROM search_cache WHERE key IN "
+            "(SELECT key FROM search_cache ORDER BY accessed LIMIT ?)",
+            (overflow,),
+        )
+        return overflow
+
+    def delete(self, key):
+        self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix: str):
+        # Range scan on the primary key; prefixes end in ":", so prefix + ";"
+        # is the first key past them
+        self._conn.execute(
+            "DELETE FROM search_cache WHERE key >= ? AND key < ?", (prefix, prefix[:-1] + ";")
+        )
+
+    def clear(self):
+        self._conn.execute("DELETE FROM search_cache")
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+
+
+class SearchCache:
+    """LRU + TTL cache of serialized search responses.
+
+    Keys embed the site and its menu version, so entries for an old menu are
+    never served; clear(site) drops that site's entries eagerly when its menu
+    changes.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            value, created = entry
+            if self.ttl and time.time() - created > self.ttl:
+                self.backend.delete(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return value
+
+    def set(self, key, value: str):
+        with self._lock:
+            self.stats.evictions += self.backend.set(key, value, time.time())
+
+    def clear(self, site: Optional[int] = None):
+        """Drop `site`'s entries, or every entry when `site` is None."""
+        with self._lock:
+            if site is None:
+                self.backend.clear()
+            else:
+                self.backend.delete_prefix(site_prefix(site))
+
+    def info(self):
+        with self._lock:
+            size = len(self.backend)
+        return {
+            "backend": type(self.backend).__name__,
+            "size": size,
+            "max_size": self.backend.max_size,
+            "ttl": self.ttl,
+            **self.stats.as_dict(),
+        }
+
+
+def create_cache(backend: str = CACHE_BACKEND) -> SearchCache:
+    if backend == "sqlite":
+        store = SQLiteBackend(CACHE_SIZE, CACHE_PATH)
+    elif backend == "memory":
+        store = MemoryBackend(CACHE_SIZE)
+    else:
+        raise ValueError(f"Unknown SEARCH_CACHE_BACKEND: {backend}")
+    return SearchCache(store, CACHE_TTL)
+
+
+search_cache = create_cache()
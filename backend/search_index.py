@@ -0,0 +1,231 @@
+import math
+from collections import defaultdict
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models, sites
+from .allergens import ALLERGEN_SYNONYMS, DIET_SYNONYMS, diet_mask, exclusion_mask
+from .text import stem, tokenize, words
+
+# Field weights used when ranking keyword matches
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "description": 1.0, "tags": 1.0}
+
+CATEGORY_SYNONYMS = {
+    "drink": ("Drinks",), "beverage": ("Drinks",),
+    "dessert": ("Cakes", "Ice Cream"), "pudding": ("Cakes", "Ice Cream"), "sweet": ("Cakes", "Ice Cream"),
+    "kid": ("Kids",), "child": ("Kids",), "children": ("Kids",),
+    "main": ("Mains",), "lunch": ("Mains",), "dinner": ("Mains",),
+    "side": ("Sides",), "snack": ("Snacks",), "sandwich": ("Sandwiches",),
+    "jacket": ("Jackets",), "potato": ("Jackets",), "toastie": ("Toasties",),
+}
+
+# Words that turn a lookup into a request only the model can handle well:
+# quantities, group orders, plans and prices
+CONVERSATIONAL_WORDS = {
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "dozen", "couple", "pair", "people", "person", "us", "we", "family", "group",
+    "plan", "suggest", "recommend", "recommendation", "should", "combo", "each",
+    "total", "cost", "much", "budget", "cheap", "cheapest", "under", "over", "less",
+    "more", "than", "per", "order", "best", "popular", "why", "how", "safe",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "i", "m", "s", "t", "me", "my", "you", "your", "do", "does", "is", "are",
+    "there", "any", "some", "something", "anything", "option", "item", "food", "dish",
+    "thing", "what", "which", "have", "got", "get", "want", "would", "like", "looking",
+    "for", "with", "and", "or", "of", "on", "in", "please", "show", "give", "can", "all",
+    "menu", "that", "to", "based", "tree", "dioxide", "listed", "none", "serve", "served",
+}
+
+NEGATIONS = {"no", "without", "not", "avoid", "except", "minus", "exclude", "excluding"}
+ALLERGY_SUFFIXES = {"free", "allergy", "allergie", "allergic", "intolerant", "intolerance"}
+
+
+class ParsedQuery(NamedTuple):
+    keywords: List[str]
+    unknown: List[str]
+    categories: set
+    diets: set
+    exclude: set
+    conversational: bool
+
+
+class LocalAnswer(NamedTuple):
+    ids: List[int]
+    answer: str
+
+
+class MenuIndex:
+    """In-memory inverted index over the menu, rebuilt when the menu changes."""
+
+    def __init__(self, items):
+        self.order = []
+        self.categories = {}
+        # Bitmasks, see backend.allergens
+        self.diets = {}
+        self.allergens = {}
+        # Items whose allergen sheet carries a free-text safety alert
+        self.flagged = set()
+        self.postings = defaultdict(dict)  # stem -> {item_id: weighted term frequency}
+        # Category names as stem tuples, e.g. ("ice", "cream") -> "Ice Cream"
+        self.category_lookup = {}
+
+        for item in items:
+            self.order.append(item.id)
+            self.categories[item.id] = item.category
+            self.diets[item.id] = item.diet_mask or 0
+            # Exclusions are strict: "may contain" counts as contains
+            self.allergens[item.id] = (item.allergen_mask or 0) | (item.may_contain_mask or 0)
+            if item.safety_alerts:
+                self.flagged.add(item.id)
+            fields = {
+                "name": item.name,
+                "category": item.category,
+                "description": item.description,
+                "tags": item.dietary_tags,
+            }
+            for field, text in fields.items():
+                for token in tokenize(text):
+                    postings = self.postings[token]
+                    postings[item.id] = postings.get(item.id, 0.0) + FIELD_WEIGHTS[field]
+            if item.category:
+                self.category_lookup[tuple(tokenize(item.category))] = item.category
+
+        known = set(self.categories.values())
+        self.category_synonyms = {
+            token: tuple(c for c in targets if c in known)
+            for token, targets in CATEGORY_SYNONYMS.items()
+        }
+
+        self.known_diets = 0
+        for mask in self.diets.values():
+            self.known_diets |= mask
+
+        total = len(self.order) or 1
+        self.idf = {t: math.log(1 + total / len(p)) for t, p in self.postings.items()}
+
+    def parse(self, q: str) -> ParsedQuery:
+        tokens = [stem(t) for t in words(q)]
+        keywords, unknown = [], []
+        categories, diets, exclude = set(), set(), set()
+        conversational = any(t.isdigit() for t in tokens)
+
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+
+            # "no nuts or gluten", "without dairy", "allergic to eggs"
+            if token in NEGATIONS or (token == "allergic" and nxt == "to") or (token == "free" and nxt == "from"):
+                j = i + (2 if token in ("allergic", "free") else 1)
+                found = False
+                while j < len(tokens) and (tokens[j] in ALLERGEN_SYNONYMS or tokens[j] in STOPWORDS):
+                    if tokens[j] in ALLERGEN_SYNONYMS:
+                        exclude.add(ALLERGEN_SYNONYMS[tokens[j]])
+                        found = True
+                    j += 1
+                if found:
+                    i = j
+                    continue
+            # "nut free", "gluten-free", "dairy intolerant"
+            if token in ALLERGEN_SYNONYMS and nxt in ALLERGY_SUFFIXES:
+                exclude.add(ALLERGEN_SYNONYMS[token])
+                i += 2
+                continue
+
+            if (token, nxt) in self.category_lookup:
+                categories.add(self.category_lookup[(token, nxt)])
+                i += 2
+                continue
+
+            # Diets no item is tagged with (e.g. halal) are left to the model
+            if token in DIET_SYNONYMS and self.known_diets & diet_mask([DIET_SYNONYMS[token]]):
+                diets.add(DIET_SYNONYMS[token])
+            elif (token,) in self.category_lookup:
+                categories.add(self.category_lookup[(token,)])
+            elif token in CONVERSATIONAL_WORDS:
+                conversational = True
+            elif token in STOPWORDS or token in ALLERGY_SUFFIXES or token in NEGATIONS:
+                pass
+            elif token in self.postings:
+                keywords.append(token)
+            elif self.category_synonyms.get(token):
+                categories.update(self.category_synonyms[token])
+            else:
+                unknown.append(token)
+            i += 1
+
+        return ParsedQuery(keywords, unknown, categories, diets, exclude, conversational)
+
+    def search(self, parsed: ParsedQuery, limit: Optional[int] = None) -> List[int]:
+        """Return item IDs passing the filters, best keyword matches first."""
+        required = diet_mask(parsed.diets)
+        excluded = exclusion_mask(parsed.exclude)
+        candidates = []
+        for position, item_id in enumerate(self.order):
+            if parsed.categories and self.categories[item_id] not in parsed.categories:
+                continue
+            if self.diets[item_id] & required != required:
+                continue
+            if self.allergens[item_id] & excluded:
+                continue
+            # The masks may not capture what a safety alert says, so never
+            # vouch for a flagged item as free from anything
+            if excluded and item_id in self.flagged:
+                continue
+            matched, score = 0, 0.0
+            for token in set(parsed.keywords):
+                weight = self.postings[token].get(item_id)
+                if weight:
+                    matched += 1
+                    score += weight * self.idf[token]
+            if parsed.keywords and not matched:
+                continue
+            candidates.append((-matched, -score, position, item_id))
+
+        candidates.sort()
+        ids = [c[3] for c in candidates]
+        return ids[:limit] if limit else ids
+
+    def answer(self, q: str) -> Optional[LocalAnswer]:
+        """Answer simple lookups locally; None means the query needs the model."""
+        parsed = self.parse(q)
+        if parsed.conversational or parsed.unknown:
+            return None
+        if not (parsed.keywords or parsed.categories or parsed.diets or parsed.exclude):
+            return None
+        ids = self.search(parsed)
+        return LocalAnswer(ids, describe(parsed, len(ids)))
+
+
+def describe(parsed: ParsedQuery, count: int) -> str:
+    if count == 0:
+        return "Sorry, nothing on the menu matches that. Please ask a member of staff for help."
+    parts = [str(count)]
+    if parsed.diets:
+        parts.append(" & ".join(sorted(parsed.diets)))
+    parts.append("item" if count == 1 else "items")
+    if parsed.categories:
+        parts.append("in " + ", ".join(sorted(parsed.categories)))
+    if parsed.keywords:
+        parts.append("matching '" + " ".join(parsed.keywords) + "'")
+    if parsed.exclude:
+        parts.append("free from " + ", ".join(sorted(parsed.exclude)))
+    text = "Found " + " ".join(parts) + "."
+    if parsed.exclude:
+        text += " Items with an allergen alert are left out; please mention any allergies to staff when ordering."
+    return text
+
+
+_indexes = sites.SiteCache("search_index")
+
+
+def _build(db: Session, version: str) -> MenuIndex:
+    return MenuIndex(
+        db.query(models.MenuItem).filter(models.MenuItem.site_id == sites.site_id(db)).order_by(models.MenuItem.id).all()
+    )
+
+
+def get_index(db: Session) -> MenuIndex:
+    return _indexes.get_or_build(db, _build)
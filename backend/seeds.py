@@ -1,41 +1,32 @@
-from sqlalchemy.orm import Session
 from .database import SessionLocal, engine
-from . import models
+from . import models, sites
+from .log import log_event
+from .menu_import import import_menu, load_items
 
 def seed_data(force: bool = False):
-    models.Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    
-    # Check if data exists and is sufficient
-    item_count = db.query(models.MenuItem).count()
-    if item_count > 50:
-        if force:
-            print("Forcing re-seed: Deleting existing items...")
-            db.query(models.MenuItem).delete()
-            db.commit()
-        else:
-            print(f"Data already exists ({item_count} items). Skipping seed.")
-            db.close()
-            return
-    elif item_count > 0:
-        print(f"Partial data detected ({item_count} items). Clearing and re-seeding...")
-        db.query(models.MenuItem).delete()
-        db.commit()
+    """Bring the default site's menu in line with the built-in menu (parse_structured).
 
-    # Ingredients (simplified for now, extracting unique allergens from PDF logic would be complex here)
-    # We will just store allergens in the menu item or ingredient text for now.
-    
-    # Menu Items from PDF (Full List)
-    from .parse_menu import parse_structured
-    items = parse_structured()
+    Only differences are written and existing items keep their IDs. With
+    `force`, items that are no longer on the built-in menu are removed too.
+    Expects the schema to exist; see bootstrap.prepare_database().
+    """
+    db = SessionLocal()
+    try:
+        report = import_menu(db, load_items(), prune=force)
+    finally:
+        db.close()
 
-    for item_data in items:
-        db_item = models.MenuItem(**item_data)
-        db.add(db_item)
-    
-    db.commit()
-    print("Database seeded successfully.")
-    db.close()
+    log_event(
+        "menu_seeded" if report.changed else "menu_up_to_date",
+        added=len(report.added),
+        updated=len(report.updated),
+        removed=len(report.removed),
+        unchanged=report.unchanged,
+        pruned=force,
+    )
+    return report
 
 if __name__ == "__main__":
+    models.create_schema(engine)
+    sites.ensure_default_site(engine)
     seed_data()
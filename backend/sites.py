@@ -0,0 +1,131 @@
+"""Sites: the cafe locations served by one deployment.
+
+Every menu item belongs to a site. Site-scoped routes resolve the slug and
+record the site on the request's session (db.info["site_id"]); menu queries
+and the per-version caches read it from there, so the unscoped /menu/ routes
+keep serving the default site unchanged.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import menu_version, metrics, models
+
+DEFAULT_SITE_ID = models.DEFAULT_SITE_ID
+DEFAULT_SITE_SLUG = os.getenv("DEFAULT_SITE_SLUG", "prom-cafe")
+DEFAULT_SITE_NAME = os.getenv("DEFAULT_SITE_NAME", "Prom Cafe")
+# Sites whose snapshot, indexes and prompt context each worker keeps in
+# memory; the least recently used site is dropped beyond this
+MAX_RESIDENT_SITES = int(os.getenv("MAX_RESIDENT_SITES", "16"))
+
+
+def site_id(db: Session) -> int:
+    """The site `db` is scoped to (the default site unless use_site() was called)."""
+    return db.info.get("site_id", DEFAULT_SITE_ID)
+
+
+def use_site(db: Session, site: int) -> Session:
+    db.info["site_id"] = site
+    return db
+
+
+_slugs = {}
+_slugs_lock = threading.Lock()
+
+
+def resolve(db: Session, slug: str) -> Optional[int]:
+    """Site ID for `slug`, or None if there is no such site."""
+    with _slugs_lock:
+        if slug in _slugs:
+            return _slugs[slug]
+    found = db.execute(select(models.Site.id).where(models.Site.slug == slug)).scalar()
+    if found is not None:
+        # Sites aren't renamed or deleted at runtime; unknown slugs aren't
+        # cached so new sites show up without a restart
+        with _slugs_lock:
+            _slugs[slug] = found
+    return found
+
+
+def ensure_site(db: Session, slug: str, name: Optional[str] = None) -> int:
+    """ID of the site with `slug`, creating it if needed (caller commits)."""
+    found = db.execute(select(models.Site.id).where(models.Site.slug == slug)).scalar()
+    if found is not None:
+        return found
+    site = models.Site(slug=slug, name=name or slug.replace("-", " ").title())
+    db.add(site)
+    db.flush()
+    return site.id
+
+
+def ensure_default_site(engine):
+    """Create the default site on a fresh (or pre-sites) database. It is the
+    first row, so it gets the ID existing menu items already point at."""
+    with Session(engine) as db:
+        if db.get(models.Site, DEFAULT_SITE_ID) is None:
+            db.add(models.Site(slug=DEFAULT_SITE_SLUG, name=DEFAULT_SITE_NAME))
+            db.commit()
+
+
+class SiteCache:
+    """Per-site values built for one menu version (snapshots, indexes...).
+
+    An LRU over sites, so a worker serving many sites keeps at most
+    MAX_RESIDENT_SITES of each in memory; an evicted site is rebuilt on its
+    next request.
+    """
+
+    def __init__(self, name: str, max_sites: int = MAX_RESIDENT_SITES):
+        self.name = name
+        self.max_sites = max_sites
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # site id -> (version, value)
+        self.evictions = 0
+        _caches.append(self)
+
+    def get(self, site: int, version: str):
+        with self._lock:
+            entry = self._data.get(site)
+            if entry is None or entry[0] != version:
+                return None
+            self._data.move_to_end(site)
+            return entry[1]
+
+    def get_or_build(self, db: Session, build):
+        """The value for `db`'s site at its current menu version, made with
+        `build(db, version)` when missing or stale."""
+        site, version = site_id(db), menu_version.current(db)
+        value = self.get(site, version)
+        if value is None:
+            value = build(db, version)
+            self.set(site, version, value)
+        return value
+
+    def set(self, site: int, version: str, value):
+        with self._lock:
+            self._data[site] = (version, value)
+            self._data.move_to_end(site)
+            while len(self._data) > self.max_sites:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+_caches = []
+
+
+def _cache_stats():
+    stats = []
+    for cache in _caches:
+        stats.append(({"cache": cache.name, "stat": "sites"}, len(cache)))
+        stats.append(({"cache": cache.name, "stat": "evictions"}, cache.evictions))
+    return stats
+
+
+metrics.register_gauges("flavorly_site_cache", "Sites resident in each per-site cache, and evictions.", _cache_stats)
@@ -0,0 +1,26 @@
+import re
+from typing import List, Optional
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def stem(token: str) -> str:
+    """Light suffix stripping; enough to fold plurals on a cafe menu."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith("oes"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def words(text: Optional[str]) -> List[str]:
+    """Lower-cased alphanumeric words, unstemmed."""
+    if not text:
+        return []
+    return _TOKEN.findall(text.lower())
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [stem(t) for t in words(text)]
@@ -0,0 +1,190 @@
+"""Vector retrieval of prompt candidates.
+
+Menu items are embedded as hashed word and character-trigram vectors (no
+model download, deterministic across workers), stacked into one NumPy
+matrix, and matched against a query with a single dot product. Only the
+top-k items go into the Gemini prompt, so prompt size stays flat as the
+menu grows.
+
+    python -m backend.vector_index --out vector_index.npz   # precompute
+"""
+import argparse
+import os
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models, menu_version, sites
+from .pricing import ADDON_NAMES
+from .search_index import CONVERSATIONAL_WORDS, STOPWORDS, MenuIndex
+from .text import stem, words
+
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "1024"))
+# Items sent to Gemini per query; 0 turns retrieval off
+PROMPT_TOP_K = int(os.getenv("PROMPT_TOP_K", "24"))
+# Cosine similarity below which an item isn't considered a match
+VECTOR_MIN_SCORE = float(os.getenv("VECTOR_MIN_SCORE", "0.05"))
+# Optional precomputed index, reused while the menu version matches
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "")
+
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "tags": 1.0, "description": 1.0}
+# Words that say nothing about which item is wanted
+_SKIP = STOPWORDS | CONVERSATIONAL_WORDS
+
+
+def _features(text: Optional[str], weight: float, skip=frozenset()):
+    for word in words(text):
+        if word in skip:
+            continue
+        token = stem(word)
+        yield "w:" + token, weight
+        padded = f"^{token}$"
+        # Trigrams catch partial matches: "burgers" ~ "burger", "choc" ~ "chocolate"
+        for i in range(len(padded) - 2):
+            yield "g:" + padded[i:i + 3], weight * 0.5
+
+
+def _hash(feature: str) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    # Signed hashing keeps collisions from only ever adding similarity
+    return h % VECTOR_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+
+def embed(features) -> np.ndarray:
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for feature, weight in features:
+        column, sign = _hash(feature)
+        vector[column] += sign * weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def item_features(item):
+    yield from _features(item.name, FIELD_WEIGHTS["name"])
+    yield from _features(item.category, FIELD_WEIGHTS["category"])
+    yield from _features(item.dietary_tags, FIELD_WEIGHTS["tags"])
+    yield from _features(item.description, FIELD_WEIGHTS["description"])
+
+
+class VectorIndex:
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray, categories: np.ndarray, addon_ids: List[int] = ()):
+        self.ids = ids
+        self.matrix = matrix
+        self.categories = categories
+        self.addon_ids = list(addon_ids)
+
+    @classmethod
+    def build(cls, items) -> "VectorIndex":
+        items = list(items)
+        ids = np.array([item.id for item in items], dtype=np.int64)
+        matrix = np.zeros((len(items), VECTOR_DIM), dtype=np.float32)
+        for row, item in enumerate(items):
+            matrix[row] = embed(item_features(item))
+        categories = np.array([item.category or "Other" for item in items], dtype=str)
+        addon_ids = [item.id for item in items if item.name in ADDON_NAMES]
+        return cls(ids, matrix, categories, addon_ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, q: str, k: int, categories: Optional[Iterable[str]] = None) -> List[Tuple[int, float]]:
+        """Up to `k` (item id, cosine similarity) pairs, best first, optionally
+        only from `categories`."""
+        vector = embed(_features(q, 1.0, _SKIP))
+        if not vector.any() or not len(self.ids):
+            return []
+        scores = self.matrix @ vector
+        if categories:
+            scores[~np.isin(self.categories, list(categories))] = -1.0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if scores[i] >= VECTOR_MIN_SCORE]
+
+    def with_addons(self, ids: List[int]) -> List[int]:
+        """`ids` plus the add-ons when it includes something they go on
+        (another item from their category, e.g. a latte for oat milk)."""
+        addons = set(self.addon_ids)
+        if not addons:
+            return ids
+        addon_categories = set(self.categories[np.isin(self.ids, self.addon_ids)])
+        chosen = self.categories[np.isin(self.ids, [i for i in ids if i not in addons])]
+        if not addon_categories.intersection(chosen):
+            return ids
+        return ids + [a for a in self.addon_ids if a not in ids]
+
+    def save(self, path: str, version: str):
+        np.savez(path, ids=self.ids, matrix=self.matrix, categories=self.categories, addon_ids=np.array(self.addon_ids, dtype=np.int64),
+                 version=np.array(version), dim=np.array(VECTOR_DIM))
+
+    @classmethod
+    def load(cls, path: str, version: str) -> Optional["VectorIndex"]:
+        """The saved index, or None if it's missing or for another menu version."""
+        try:
+            with np.load(path) as data:
+                if str(data["version"]) != version or int(data["dim"]) != VECTOR_DIM:
+                    return None
+                return cls(data["ids"], data["matrix"], data["categories"], data["addon_ids"].tolist())
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def candidates_for(db: Session, q: str, index: MenuIndex, categories: Optional[set] = None) -> Optional[List[int]]:
+    """Item IDs to send to Gemini for `q`, ranked within `categories` when
+    the query hints at some, or None to fall back to the category filter
+    (retrieval off, small menu, or nothing specific asked)."""
+    if PROMPT_TOP_K <= 0:
+        return None
+    vectors = get_vector_index(db)
+    if len(vectors) <= PROMPT_TOP_K:
+        return None
+    # Category and diet synonyms ("lunch" -> Mains) aren't in the item text
+    parsed = index.parse(q)
+    hits = vectors.search(" ".join([q, *parsed.categories, *parsed.diets]), PROMPT_TOP_K, categories)
+    if not hits:
+        return None
+    return vectors.with_addons([item_id for item_id, _ in hits])
+
+
+_vectors = sites.SiteCache("vector_index")
+
+
+def _site_items(db: Session):
+    return db.query(models.MenuItem).filter(models.MenuItem.site_id == sites.site_id(db)).order_by(models.MenuItem.id)
+
+
+def _build(db: Session, version: str) -> VectorIndex:
+    vectors = VectorIndex.load(VECTOR_INDEX_PATH, version) if VECTOR_INDEX_PATH else None
+    return vectors if vectors is not None else VectorIndex.build(_site_items(db))
+
+
+def get_vector_index(db: Session) -> VectorIndex:
+    return _vectors.get_or_build(db, _build)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=VECTOR_INDEX_PATH or "vector_index.npz")
+    parser.add_argument("--site", default=sites.DEFAULT_SITE_SLUG, help="site slug (default: the default site)")
+    args = parser.parse_args(argv)
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        site = sites.resolve(db, args.site)
+        if site is None:
+            parser.error(f"unknown site: {args.site}")
+        sites.use_site(db, site)
+        version = menu_version.compute_version(db)
+        vectors = VectorIndex.build(_site_items(db))
+    finally:
+        db.close()
+    vectors.save(args.out, version)
+    print(f"Saved {len(vectors)} item vectors ({VECTOR_DIM} dims) for menu version {version} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import random
+import re
+
+_ITEM_IDS = re.compile(r'"i":(\d+)')
+# Numbered requests in a batch prompt, e.g. '    2. "a latte"'
+_BATCH_REQUEST = re.compile(r'^\s*(\d+)\. "', re.M)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    def __init__(self, text, chunk_size, delay):
+        self._chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self._delay = delay
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._chunks:
+            raise StopAsyncIteration
+        await asyncio.sleep(self._delay)
+        return FakeResponse(self._chunks.pop(0))
+
+
+class FakeGemini:
+    """Offline stand-in for the Gemini model used by backend.llm.
+
+    Replies after a configurable delay with a plausible {"items", "note"}
+    object built from item IDs found in the prompt, and can be told to fail
+    or return malformed JSON at a given rate.
+    """
+
+    def __init__(self, latency=0.8, jitter=0.3, failure_rate=0.0, malformed_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self):
+        return max(0.0, self.random.gauss(self.latency, self.jitter))
+
+    def _reply(self, prompt):
+        if self.random.random() < self.failure_rate:
+            raise RuntimeError("fake Gemini failure")
+        ids = [int(i) for i in _ITEM_IDS.findall(prompt)]
+        if self.random.random() < self.malformed_rate:
+            return '{"items": ' + json.dumps(self._result(ids)["items"]) + ', "note": "unterminated'
+        requests = [int(n) for n in _BATCH_REQUEST.findall(prompt)]
+        if requests:
+            results = [{"n": n, **self._result(ids)} for n in requests]
+            return json.dumps({"results": results})
+        return json.dumps(self._result(ids))
+
+    def _result(self, ids):
+        picked = self.random.sample(ids, min(len(ids), 3))
+        items = [{"id": i, "quantity": self.random.randint(1, 3)} for i in picked]
+        return {"items": items, "note": "Enjoy your meal!"}
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls += 1
+        if stream:
+            # First chunk arrives after a fraction of the full latency
+            text = self._reply(prompt)
+            await asyncio.sleep(self._delay() * 0.2)
+            return FakeStream(text, chunk_size=24, delay=0.02)
+        await asyncio.sleep(self._delay())
+        return FakeResponse(self._reply(prompt))
@@ -0,0 +1,74 @@
+"""Throughput benchmark for the allergen-sheet dump parser.
+
+Concatenates the sample dumps in bench/dumps/ into one large temporary file
+and streams it through backend.parse_menu.parse_menu_dump, reporting items
+and megabytes per second (and peak Python memory with --memory).
+
+    python -m bench.parse_dumps --repeat 2000
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+DUMPS_DIR = os.path.join(os.path.dirname(__file__), "dumps")
+
+
+def build_corpus(paths, repeat, out_path):
+    with open(out_path, "w", encoding="utf-8") as out:
+        for _ in range(repeat):
+            for path in paths:
+                with open(path, encoding="utf-8") as f:
+                    out.write(f.read())
+                out.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="dump files (default: bench/dumps/*.txt)")
+    parser.add_argument("--repeat", type=int, default=1000, help="copies of the corpus to parse")
+    parser.add_argument("--memory", action="store_true", help="also report peak memory (slows parsing)")
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    from backend.parse_menu import parse_menu_dump
+
+    paths = args.paths or sorted(glob.glob(os.path.join(DUMPS_DIR, "*.txt")))
+    with tempfile.TemporaryDirectory(prefix="flavorly-dumps-") as workdir:
+        corpus = os.path.join(workdir, "corpus.txt")
+        build_corpus(paths, args.repeat, corpus)
+        size = os.path.getsize(corpus)
+
+        if args.memory:
+            tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            count = sum(1 for _ in parse_menu_dump(corpus))
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if args.memory else None
+        finally:
+            tracemalloc.stop()
+
+    report = {
+        "files": [os.path.basename(p) for p in paths],
+        "repeat": args.repeat,
+        "bytes": size,
+        "items": count,
+        "seconds": round(elapsed, 3),
+        "items_per_s": round(count / elapsed) if elapsed else None,
+        "mb_per_s": round(size / elapsed / 1e6, 2) if elapsed else None,
+        "peak_memory_kb": round(peak / 1024) if peak is not None else None,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
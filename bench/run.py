@@ -0,0 +1,210 @@
+"""Offline load test for the Flavorly API.
+
+Boots backend.main:app under uvicorn against a throwaway SQLite database and
+the FakeGemini model, drives each endpoint at a fixed concurrency and reports
+throughput and latency percentiles.
+
+    python -m bench.run --requests 500 --concurrency 20 --out bench/results/latest.json
+    python -m bench.run --compare bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SEARCH_QUERIES = [
+    # Answered locally
+    "vegan options",
+    "something gluten free",
+    "no nuts or dairy",
+    "coffee",
+    "vegan burger",
+    # Conversational, go to the model
+    "breakfast for 3 people",
+    "2 lattes and a muffin",
+    "what should a family of four have for lunch",
+    "3 meals, one vegan",
+    "a cheap snack and a drink for two kids",
+]
+
+TARGETS = {
+    "health": lambda i: "/health",
+    "menu": lambda i: "/menu/",
+    "menu_category": lambda i: "/menu/?category=Drinks",
+    "search": lambda i: "/menu/search/?q=" + SEARCH_QUERIES[i % len(SEARCH_QUERIES)],
+    # (path, JSON body) targets are POSTed; one kiosk session of four diners
+    "search_batch": lambda i: ("/menu/search/batch", {"queries": [SEARCH_QUERIES[(i + k) % len(SEARCH_QUERIES)] for k in range(4)]}),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 2)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else None,
+    }
+
+
+async def drive(base_url, path_for, total, concurrency):
+    import httpx
+
+    counter = itertools.count()
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+
+        async def worker():
+            nonlocal errors
+            while (i := next(counter)) < total:
+                start = time.perf_counter()
+                target = path_for(i)
+                try:
+                    if isinstance(target, tuple):
+                        response = await client.post(target[0], json=target[1])
+                    else:
+                        response = await client.get(target)
+                    if response.status_code >= 400:
+                        errors += 1
+                        continue
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("server failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    print(f"\n{'target':<14}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for target, stats in current["results"].items():
+        base = baseline.get("results", {}).get(target)
+        if not base:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            old, new = base.get(metric), stats.get(metric)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{target:<14}{metric:<16}{old:>12}{new:>12}{change:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma separated: " + ", ".join(TARGETS))
+    parser.add_argument("--requests", type=int, default=300, help="requests per target")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per target")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="mean fake Gemini latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.3)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--no-cache", action="store_true", help="disable the search answer cache")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    # Configure the app before it is imported: throwaway DB, no network
+    workdir = tempfile.mkdtemp(prefix="flavorly-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ["SEARCH_CACHE_BACKEND"] = "memory"
+    # Fake searches stay out of the real query log that backend.analytics reads
+    os.environ["QUERY_LOG_PATH"] = os.path.join(workdir, "query_log.jsonl")
+    if args.no_cache:
+        os.environ["SEARCH_CACHE_SIZE"] = "0"
+
+    from backend import llm, main as app_module
+    from bench.fake_gemini import FakeGemini
+
+    fake = FakeGemini(args.llm_latency, args.llm_jitter, args.llm_failure_rate, args.llm_malformed_rate, seed=args.seed)
+    llm.model = fake
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server, thread = start_server(app_module.app, port)
+
+    results = {}
+    try:
+        for name in args.targets.split(","):
+            path_for = TARGETS[name.strip()]
+            if args.warmup:
+                asyncio.run(drive(base_url, path_for, args.warmup, min(args.warmup, args.concurrency)))
+            results[name] = asyncio.run(drive(base_url, path_for, args.requests, args.concurrency))
+            print(f"{name:<14}" + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "llm_calls": fake.calls,
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 const API_URL = '';
 let currentCategory = 'Breakfast';
-let fullMenu = []; // Store the complete menu
+let menuByCategory = {}; // Items per category, loaded from the server on demand
 let suggestedItems = []; // Store AI-suggested items
 let currentAnswer = null; // Store current AI answer
 
 async function fetchMenu(query = '', forceRefresh = false) {
-    console.log('fetchMenu called', { query, forceRefresh, fullMenuLength: fullMenu.length });
+    console.log('fetchMenu called', { query, forceRefresh });
     const container = document.getElementById('menuContainer');
+    // The server filters by category, so only the visible category is downloaded
+    const category = currentCategory === 'Your Meal' ? 'Breakfast' : currentCategory;
+    const cachedItems = menuByCategory[category];
 
     // Show loading state if it's a new search or initial load
-    if (query || forceRefresh || fullMenu.length === 0) {
+    if (query || forceRefresh || !cachedItems) {
         container.innerHTML = `
             <div class="animate-pulse space-y-4">
                 <div class="h-32 bg-gray-200 rounded-2xl"></div>
@@ -17,12 +20,20 @@ async function fetchMenu(query = '', forceRefresh = false) {
             </div>`;
     }
 
+    // Stream search results so items and the answer appear as soon as they're known
+    if (query && window.EventSource) {
+        streamSearch(query);
+        return;
+    }
+
     // Only fetch from server if searching OR if we don't have cached data
     // If searching, we always fetch to get new suggestions
-    if (query || fullMenu.length === 0 || forceRefresh) {
-        // Cache busting
-        const timestamp = new Date().getTime();
-        const endpoint = query ? `/menu/search/?q=${encodeURIComponent(query)}&t=${timestamp}` : `/menu/?t=${timestamp}`;
+    if (query || !cachedItems || forceRefresh) {
+        // The menu is revalidated with its ETag, so no cache busting is needed
+        let endpoint = category === 'All' ? `/menu/` : `/menu/?category=${encodeURIComponent(category)}`;
+        if (query) {
+            endpoint = `/menu/search/?q=${encodeURIComponent(query)}`;
+        }
         try {
             console.log('Fetching from:', endpoint);
             const response = await fetch(`${API_URL}${endpoint}`);
@@ -49,11 +60,13 @@ async function fetchMenu(query = '', forceRefresh = false) {
                 // Automatically switch to "Your Meal"
                 switchCategory('Your Meal');
             } else {
-                // It's the full menu load
-                fullMenu = items;
-                console.log('Full menu loaded:', fullMenu.length);
-                // Ensure "Your Meal" is hidden on full refresh/load
-                hideYourMealCategory();
+                // It's a category load
+                menuByCategory[category] = items;
+                console.log('Category loaded:', category, items.length);
+                // Ensure "Your Meal" is hidden on full refresh
+                if (forceRefresh) {
+                    hideYourMealCategory();
+                }
                 renderMenu();
             }
 
@@ -73,6 +86,67 @@ async function fetchMenu(query = '', forceRefresh = false) {
     }
 }
 
+function streamSearch(query) {
+    const source = new EventSource(`${API_URL}/menu/search/stream?q=${encodeURIComponent(query)}`);
+    let received = false;
+
+    suggestedItems = [];
+    currentAnswer = '';
+
+    source.addEventListener('items', (e) => {
+        received = true;
+        suggestedItems = JSON.parse(e.data);
+        console.log('Streamed items:', suggestedItems.length);
+        showYourMealCategory();
+        switchCategory('Your Meal');
+    });
+
+    source.addEventListener('answer', (e) => {
+        received = true;
+        currentAnswer += JSON.parse(e.data).delta;
+        // Update the answer text in place rather than re-rendering every card
+        const answerText = document.getElementById('aiAnswerText');
+        if (answerText) {
+            answerText.textContent = currentAnswer;
+        }
+    });
+
+    source.addEventListener('done', (e) => {
+        source.close();
+        currentAnswer = JSON.parse(e.data).answer;
+        showYourMealCategory();
+        switchCategory('Your Meal');
+    });
+
+    source.onerror = () => {
+        source.close();
+        if (!received) {
+            // Streaming unavailable (proxy, old server); use the regular endpoint
+            console.warn('Search stream failed, falling back to /menu/search/');
+            fetchSearch(query);
+        }
+    };
+}
+
+async function fetchSearch(query) {
+    const container = document.getElementById('menuContainer');
+    try {
+        const response = await fetch(`${API_URL}/menu/search/?q=${encodeURIComponent(query)}`);
+        const data = await response.json();
+        suggestedItems = data.items;
+        currentAnswer = data.answer;
+        showYourMealCategory();
+        switchCategory('Your Meal');
+    } catch (error) {
+        console.error('Error searching menu:', error);
+        container.innerHTML = `
+            <div class="text-center py-12">
+                <p class="text-red-500 font-medium">Search failed.</p>
+                <p class="text-xs text-gray-400 mt-2">${error.message}</p>
+            </div>`;
+    }
+}
+
 function showYourMealCategory() {
     const btn = document.getElementById('yourMealBtn');
     if (btn) {
@@ -113,16 +187,16 @@ async function switchCategory(category) {
         }
     });
 
-    if (category !== 'Your Meal' && fullMenu.length === 0) {
-        console.log('Full menu missing, fetching...');
-        await fetchMenu(); // Fetch full menu
+    if (category !== 'Your Meal' && !menuByCategory[category]) {
+        console.log('Category not loaded, fetching...');
+        await fetchMenu(); // Fetch this category
     } else {
         renderMenu();
     }
 }
 
 function renderMenu() {
-    console.log('renderMenu called', { currentCategory, fullMenuLength: fullMenu.length, suggestedItemsLength: suggestedItems.length });
+    console.log('renderMenu called', { currentCategory, suggestedItemsLength: suggestedItems.length });
     const container = document.getElementById('menuContainer');
     container.innerHTML = '';
 
@@ -133,16 +207,15 @@ function renderMenu() {
         itemsToRender = suggestedItems;
         answerToRender = currentAnswer;
     } else {
-        // Filter from full menu
-        itemsToRender = (currentCategory === 'All')
-            ? fullMenu
-            : fullMenu.filter(item => item.category === currentCategory);
+        // Already filtered by the server
+        itemsToRender = menuByCategory[currentCategory] || [];
     }
 
     console.log('Items to render:', itemsToRender.length);
 
     // Show AI Answer if present AND we are in "Your Meal" category
-    if (answerToRender && currentCategory === 'Your Meal') {
+    // (an empty string means the answer is still streaming in)
+    if (answerToRender != null && currentCategory === 'Your Meal') {
         const answerDiv = document.createElement('div');
         answerDiv.className = 'bg-brand-50 border border-brand-100 p-5 rounded-2xl mb-6 flex items-start gap-3 shadow-sm';
         answerDiv.innerHTML = `
@@ -151,7 +224,7 @@ function renderMenu() {
             </div>
             <div>
                 <p class="text-brand-900 font-medium text-base">AI Suggestion</p>
-                <p class="text-gray-700 text-base mt-1 leading-relaxed whitespace-pre-wrap">${answerToRender}</p>
+                <p id="aiAnswerText" class="text-gray-700 text-base mt-1 leading-relaxed whitespace-pre-wrap">${answerToRender}</p>
             </div>
         `;
         container.appendChild(answerDiv);
@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+import pytest
+
+# Configure the app before it is imported: throwaway database, build dir and
+# search log, and no Gemini key so nothing leaves the machine
+_workdir = tempfile.mkdtemp(prefix="flavorly-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["STATIC_BUILD_DIR"] = os.path.join(_workdir, "static")
+os.environ["QUERY_LOG_PATH"] = ""
+os.environ["SEARCH_CACHE_BACKEND"] = "memory"
+os.environ["GEMINI_API_KEY"] = ""
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    # Entering the client runs the lifespan: schema, seed and asset build
+    with TestClient(app) as test_client:
+        yield test_client
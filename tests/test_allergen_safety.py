@@ -0,0 +1,75 @@
+"""Allergen exclusions must never vouch for an item whose allergen sheet
+carries a safety alert the masks may not reflect."""
+import pytest
+
+from backend import allergens
+
+FLAGGED = {"Vegan Chicken Burger", "Sourdough Toastie"}
+
+
+@pytest.mark.parametrize("q", ["dairy free", "no egg", "mustard free"])
+def test_local_exclusions_leave_out_flagged_items(client, q):
+    response = client.get("/menu/search/", params={"q": q})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["items"]
+    assert "free from" in body["answer"]
+    assert not FLAGGED & {item["name"] for item in body["items"]}
+
+
+def test_flagged_items_still_found_without_exclusions(client):
+    names = {item["name"] for item in client.get("/menu/search/", params={"q": "burger"}).json()["items"]}
+    assert "Vegan Chicken Burger" in names
+
+
+@pytest.mark.parametrize(
+    "exclude, leaves_out",
+    [
+        ("milk", {"Vegan Chicken Burger"}),
+        ("eggs", {"Vegan Chicken Burger", "Sourdough Toastie"}),
+        ("mustard", {"Sourdough Toastie"}),
+    ],
+)
+def test_filter_reads_safety_alerts(client, exclude, leaves_out):
+    names = {item["name"] for item in client.get("/menu/filter", params={"exclude": exclude}).json()}
+    assert names
+    assert not leaves_out & names
+
+
+def test_not_vegan_alert_drops_vegan(client):
+    names = {item["name"] for item in client.get("/menu/filter", params={"diet": "vegan"}).json()}
+    assert "Vegan Breakfast" in names
+    assert "Vegan Chicken Burger" not in names
+
+
+def test_alert_masks():
+    burger = allergens.item_masks(
+        "Vegan Chicken Burger",
+        "NOT VEGAN",
+        None,
+        "CRITICAL: This dish is NOT VEGAN as currently documented. Brioche Bun contains Egg and Milk.",
+    )
+    assert allergens.allergen_names(burger["allergen_mask"]) == ["Eggs", "Milk"]
+    assert burger["diet_mask"] == 0
+
+    toastie = allergens.item_masks(
+        "Sourdough Toastie", "Gluten, Milk", None,
+        "MISSING DATA: No sheet found for 'Dijonnaise'. Assume Mustard & Egg.",
+    )
+    assert allergens.allergen_names(toastie["allergen_mask"]) == ["Gluten", "Eggs", "Milk", "Mustard"]
+
+    # Conditional alerts are "may contain"; oat milk is not Milk
+    ice_cream = allergens.item_masks("Scoop Ice Cream", "Milk", None, "Cookie Dough/Brownie flavors: Add Gluten/Soya.")
+    assert allergens.allergen_names(ice_cream["may_contain_mask"]) == ["Gluten", "Soya"]
+    oat = allergens.item_masks("Oat Milk", "Gluten", None, "ALERT: Unless bottle says 'Gluten Free', Oat milk contains Gluten.")
+    assert allergens.allergen_names(oat["allergen_mask"]) == ["Gluten"]
+
+
+def test_unreadable_alert_fails_every_exclusion(client):
+    chips = allergens.item_masks("Chips", "None Listed (V, VG)", None, "Check cross-contamination.")
+    assert chips["allergen_mask"] == 0
+    assert chips["may_contain_mask"] & allergens.UNKNOWN_ALLERGENS
+    assert "vegan" in allergens.diet_names(chips["diet_mask"])
+    for exclude in ("celery", "sesame", "sulphites"):
+        names = {item["name"] for item in client.get("/menu/filter", params={"exclude": exclude}).json()}
+        assert "Chips" not in names
@@ -0,0 +1,80 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from backend import pricing
+
+ITEMS = {
+    1: SimpleNamespace(id=1, name="Latte / Cappuccino", price=3.7),
+    2: SimpleNamespace(id=2, name="Oat Milk", price=0.6),
+    3: SimpleNamespace(id=3, name="Coffee & Walnut Cake", price=3.95),
+    4: SimpleNamespace(id=4, name="Scoop Ice Cream", price=1.005),
+}
+
+
+def test_money_rounds_half_up_from_the_decimal_string():
+    assert pricing.money(12.95) == Decimal("12.95")
+    assert pricing.money(1.005) == Decimal("1.01")
+    assert pricing.money(0.125) == Decimal("0.13")
+    assert pricing.money(None) == Decimal("0.00")
+
+
+def test_totals_are_exact():
+    # In floats 3 * 3.95 is 11.850000000000001
+    order = pricing.price_order(ITEMS, pricing.parse_selections([{"id": 3, "quantity": 3}, {"id": 4, "quantity": 2}]))
+    assert [line.total for line in order.lines] == [Decimal("11.85"), Decimal("2.02")]
+    assert order.total == Decimal("13.87")
+
+
+def test_quantities_are_clamped_and_merged():
+    selections = pricing.parse_selections([
+        {"id": 1, "quantity": 40},
+        {"id": 1, "quantity": "30"},
+        {"id": 3, "quantity": 999},
+    ])
+    assert {s.id: s.quantity for s in selections} == {1: pricing.MAX_QUANTITY, 3: pricing.MAX_QUANTITY}
+    order = pricing.price_order(ITEMS, selections)
+    assert order.total == (Decimal("3.70") + Decimal("3.95")) * pricing.MAX_QUANTITY
+
+
+def test_malformed_selections_are_dropped():
+    selections = pricing.parse_selections([
+        {"id": 1, "quantity": 0},
+        {"id": 1, "quantity": -2},
+        {"id": 1, "quantity": 1.5},
+        {"id": True},
+        {"quantity": 2},
+        "3",
+    ])
+    assert selections == [pricing.Selection(3, 1)]
+    assert pricing.parse_selections("not a list") == []
+
+
+def test_addons_are_charged_per_unit_of_their_item():
+    order = pricing.price_order(ITEMS, pricing.parse_selections([{"id": 1, "quantity": 2, "addons": [2]}]))
+    (line,) = order.lines
+    assert [(addon.item.name, addon.quantity, addon.total) for addon in line.addons] == [("Oat Milk", 2, Decimal("1.20"))]
+    assert order.total == Decimal("8.60")
+    assert order.ids == [1, 2]
+    assert pricing.render(order) == (
+        "2 x Latte / Cappuccino @ £3.70 = £7.40\n"
+        "  + 2 x Oat Milk @ £0.60 = £1.20\n"
+        "\n"
+        "Total: £8.60"
+    )
+
+
+def test_only_known_addons_attach():
+    # Cake isn't an add-on, so it isn't charged as one
+    order = pricing.price_order(ITEMS, pricing.parse_selections([{"id": 1, "quantity": 1, "addons": [3, 99]}]))
+    assert order.lines[0].addons == ()
+    assert order.total == Decimal("3.70")
+
+
+def test_unknown_items_are_skipped():
+    order = pricing.price_order(ITEMS, pricing.parse_selections([{"id": 99, "quantity": 2}, {"id": 3}]))
+    assert [line.item.id for line in order.lines] == [3]
+    assert order.total == Decimal("3.95")
+
+    empty = pricing.price_order(ITEMS, pricing.parse_selections([{"id": 99}]))
+    assert empty.lines == [] and empty.total == Decimal("0.00")
+    assert pricing.render(empty) == ""
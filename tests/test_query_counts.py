@@ -0,0 +1,79 @@
+"""Statement counts for the menu routes, so an N+1 (one query per item or
+per ingredient list) fails here instead of in production."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from backend import database, menu_snapshot, menu_version, search_cache, search_index, sites
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = {database.engine, database.read_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(autouse=True)
+def warm_version(client):
+    # Hash the menu and build the search index up front, so the counts don't
+    # depend on the version TTL or on test order
+    db = database.ReadSessionLocal()
+    try:
+        menu_version.current(db)
+        search_index.get_index(db)
+    finally:
+        db.close()
+    search_cache.search_cache.clear()
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"category": "Sides"},
+        {"category": "Mains", "diet": "vegetarian"},
+        {"exclude": ["nuts", "gluten"]},
+    ],
+)
+def test_menu_filter(client, params):
+    with count_statements() as statements:
+        response = client.get("/menu/filter", params=params)
+    assert response.status_code == 200
+    assert response.json()
+    # Items, then every ingredient list in one IN query
+    assert len(statements) == 2, statements
+
+
+def test_menu_cold_snapshot(client, monkeypatch):
+    monkeypatch.setattr(menu_snapshot, "_snapshots", sites.SiteCache("test_menu_snapshot"))
+    with count_statements() as statements:
+        response = client.get("/menu/")
+    assert response.status_code == 200
+    assert len(response.json()) > 1
+    assert len(statements) == 2, statements
+
+    # Served from the snapshot from then on
+    with count_statements() as statements:
+        assert client.get("/menu/", params={"skip": 5, "limit": 3}).status_code == 200
+    assert statements == []
+
+
+@pytest.mark.parametrize("q", ["vegan", "coffee", "breakfast", "nut free", "gluten free dessert"])
+def test_local_search(client, q):
+    with count_statements() as statements:
+        response = client.get("/menu/search/", params={"q": q})
+    assert response.status_code == 200
+    assert response.json()["items"]
+    assert len(statements) == 2, statements
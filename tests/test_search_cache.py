@@ -0,0 +1,32 @@
+import pytest
+
+from backend import menu_version, search_cache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "sqlite":
+        store = search_cache.SQLiteBackend(100, str(tmp_path / "cache.db"))
+    else:
+        store = search_cache.MemoryBackend(100)
+    return search_cache.SearchCache(store, ttl=0)
+
+
+def test_clear_drops_only_that_site(cache):
+    for site in (1, 2, 10):
+        cache.set(search_cache.make_key("vegan", "v1", site), f"site {site}")
+    cache.clear(1)
+    assert cache.get(search_cache.make_key("vegan", "v1", 1)) is None
+    assert cache.get(search_cache.make_key("vegan", "v1", 2)) == "site 2"
+    assert cache.get(search_cache.make_key("vegan", "v1", 10)) == "site 10"
+    cache.clear()
+    assert len(cache.backend) == 0
+
+
+def test_invalidate_notifies_with_the_site(monkeypatch):
+    seen = []
+    monkeypatch.setattr(menu_version, "_listeners", [seen.append])
+    monkeypatch.setattr(menu_version, "_versions", {1: ("a", 0.0), 2: ("b", 0.0)})
+    menu_version.invalidate(1)
+    assert seen == [1]
+    assert menu_version._versions == {2: ("b", 0.0)}